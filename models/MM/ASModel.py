@@ -3,9 +3,10 @@ import itertools
 
 from typing import List
 import math
-import numpy as np
 from scipy.stats import linregress
 
+from models.MM.RollingStats import BookStatistics
+from models.MM.LiquidityEstimator import IntensityEstimator
 from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
 
 
@@ -14,6 +15,7 @@ POSITION_LIMIT = 100
 TICK_SIZE_IN_CENTS = 100
 MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
+MID_LOOKBACK = 10 # mids in the variance window, also the horizon the EWMA variance is scaled to
 
 
 class AutoTrader(BaseAutoTrader):
@@ -28,19 +30,17 @@ class AutoTrader(BaseAutoTrader):
         self.hedge_asks = set()
         self.hedge_position = 0
 
-        self.mid_prices = []
         self.T = 1 # Reserve pricing time
 
-        # Previous prices on Orderbook
-        self.bid_prices = np.array([])
-        self.ask_prices = np.array([])
+        # Rolling mid prices, previous prices and volumes on Orderbook, in fixed-size buffers
+        self.book_stats = BookStatistics(lookback=MID_LOOKBACK, history=1000)
+
+        # Order book liquidity (k) fitted online from trade ticks, per instrument
+        self.intensity = {Instrument.FUTURE: IntensityEstimator(), Instrument.ETF: IntensityEstimator()}
 
         # At what price / volume our orders were filled
         self.orders_history = {"price": 0, "volume": 0}
 
-        self.bid_volume = []
-        self.ask_volume = []
-
         self.BID_LOT_SIZE = 10
         self.ASK_LOT_SIZE = 10
         self.steps = 0
@@ -81,6 +81,8 @@ class AutoTrader(BaseAutoTrader):
         if len(bid_prices) == 0 or len(ask_prices) == 0 or bid_prices[0] == 0 or ask_prices[0] == 0:
             return
 
+        self.intensity[instrument].update_mid((bid_prices[0] + ask_prices[0]) / (2 * TICK_SIZE_IN_CENTS))
+
         if instrument == Instrument.FUTURE:
             """
             s - mid market price
@@ -97,19 +99,18 @@ class AutoTrader(BaseAutoTrader):
             q = 0
             gamma = 0.05
             var = 0
-            k = 1
+            k = self.intensity[Instrument.ETF].k() # we quote the ETF
             if self.T > 0:
                 self.T -= 0.002
             else:
                 self.T = 0.000001
 
             if int(s) != 0:
-                self.mid_prices.append(s)
+                self.book_stats.update_mid(s)
 
-            lookback = 10
-
-            if len(self.mid_prices) >= lookback:
-                var = np.var(self.mid_prices[-1:-lookback - 1:-1])
+            if self.book_stats.mid_prices.full():
+                # EWMA variance of mid returns, in $^2 over the lookback horizon
+                var = s * s * self.book_stats.ewma.variance * MID_LOOKBACK
                 q = self.position
 
             # Reservation pricing
@@ -142,10 +143,7 @@ class AutoTrader(BaseAutoTrader):
                 self.asks.add(self.ask_id)
 
             # Add volume at the end and prices after sending order
-            self.bid_volume.append(sum(bid_volumes))
-            self.ask_volume.append(sum(ask_volumes))
-            self.ask_prices = np.append(self.ask_prices, ask_prices[0])
-            self.bid_prices = np.append(self.bid_prices, bid_prices[0])
+            self.book_stats.update_book(ask_prices, ask_volumes, bid_prices, bid_volumes)
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your orders is filled, partially or fully.
@@ -239,4 +237,5 @@ class AutoTrader(BaseAutoTrader):
         the end of both the prices and volumes arrays.
         """
         self.logger.info("received trade ticks for instrument %d with sequence number %d", instrument,
-                         sequence_number)
\ No newline at end of file
+                         sequence_number)
+        self.intensity[instrument].on_trade_ticks(ask_prices, ask_volumes, bid_prices, bid_volumes)
\ No newline at end of file
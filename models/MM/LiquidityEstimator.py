@@ -0,0 +1,110 @@
+import math
+from typing import List
+
+from models.MM.RollingStats import RingBuffer
+
+
+class RollingRegression:
+    """Least-squares line through the last size (x, y) points, updated in O(1) per point.
+
+    Running sums of x, y, x^2 and xy are adjusted as points enter and leave
+    the window and are recomputed exactly every resync points.
+    """
+    def __init__(self, size: int, resync: int = 100000):
+        self.x = RingBuffer(size)
+        self.y = RingBuffer(size)
+        self.sx = self.sy = self.sxx = self.sxy = 0.0
+        self.resync = max(resync, size)
+        self.updates = 0
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def append(self, x: float, y: float) -> None:
+        if self.x.full():
+            old_x, old_y = self.x.oldest(), self.y.oldest()
+            self.sx -= old_x
+            self.sy -= old_y
+            self.sxx -= old_x * old_x
+            self.sxy -= old_x * old_y
+        self.x.append(x)
+        self.y.append(y)
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.sxy += x * y
+        self.updates += 1
+        if self.updates % self.resync == 0:
+            xs, ys = self.x.values(), self.y.values()
+            self.sx, self.sy = xs.sum(), ys.sum()
+            self.sxx, self.sxy = (xs * xs).sum(), (xs * ys).sum()
+
+    def slope(self) -> float:
+        """Fitted slope, or nan when the x values in the window do not vary."""
+        n = len(self.x)
+        denominator = n * self.sxx - self.sx * self.sx
+        if n < 2 or denominator <= 1e-12 * max(n * self.sxx, 1.0):
+            return math.nan
+        return (n * self.sxy - self.sx * self.sy) / denominator
+
+    def intercept(self) -> float:
+        n = len(self.x)
+        return (self.sy - self.slope() * self.sx) / n if n else math.nan
+
+
+class IntensityEstimator:
+    """Online fit of the Avellaneda-Stoikov arrival intensity lambda(delta) = A exp(-k delta).
+
+    Every traded price level in a trade ticks message gives a point
+    (delta, log volume), where delta is the distance in dollars from the
+    latest mid of the same instrument. k is minus the slope of a rolling
+    regression over the last window points, clamped to k_bounds; until
+    min_points points are in, or if the fit does not decay, k_default is
+    returned.
+    """
+    def __init__(self, window: int = 500, min_points: int = 20, k_default: float = 1.0,
+                 k_bounds=(0.05, 50.0), tick_size_in_cents: int = 100):
+        self.regression = RollingRegression(window)
+        self.min_points = min_points
+        self.k_default = k_default
+        self.k_bounds = k_bounds
+        self.tick_size_in_cents = tick_size_in_cents
+        self.mid = 0.0
+
+    def update_mid(self, mid: float) -> None:
+        """Latest mid price in dollars."""
+        self.mid = mid
+
+    def on_trade_ticks(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
+                       bid_volumes: List[int]) -> None:
+        """Add the traded levels of one trade ticks message (prices in cents, zero padded)."""
+        if self.mid <= 0:
+            return
+        for prices, volumes in ((ask_prices, ask_volumes), (bid_prices, bid_volumes)):
+            for price, volume in zip(prices, volumes):
+                if price == 0 or volume <= 0:
+                    continue
+                delta = abs(price / self.tick_size_in_cents - self.mid)
+                self.regression.append(delta, math.log(volume))
+
+    def k(self) -> float:
+        if len(self.regression) < self.min_points:
+            return self.k_default
+        slope = self.regression.slope()
+        if math.isnan(slope) or slope >= 0:
+            return self.k_default
+        return min(max(-slope, self.k_bounds[0]), self.k_bounds[1])
+
+
+if __name__ == '__main__':
+    import numpy as np
+    rng = np.random.default_rng(0)
+    estimator = IntensityEstimator()
+    for _ in range(1000):
+        mid = 100 + rng.normal(0, 0.5)
+        estimator.update_mid(mid)
+        delta = rng.exponential(0.5, 5)
+        volumes = np.maximum(1, np.round(1000 * np.exp(-2.0 * delta) * rng.lognormal(0, 0.3, 5))).astype(int)
+        prices = np.round((mid + delta) * 100).astype(int)
+        estimator.on_trade_ticks(list(prices), list(volumes), [0] * 5, [0] * 5)
+    print("k =", estimator.k(), "(true 2.0)")
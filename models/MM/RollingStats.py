@@ -0,0 +1,169 @@
+import math
+from typing import List
+
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-size buffer of the most recent values, backed by a preallocated array."""
+    def __init__(self, size: int, dtype=np.float64):
+        self.data = np.zeros(size, dtype=dtype)
+        self.size = size
+        self.index = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def full(self) -> bool:
+        return self.count == self.size
+
+    def append(self, value) -> None:
+        """Store value, overwriting the oldest one once the buffer is full."""
+        self.data[self.index] = value
+        self.index = (self.index + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def oldest(self):
+        """The value the next append will overwrite once the buffer is full."""
+        return self.data[self.index if self.full() else 0]
+
+    def last(self):
+        return self.data[self.index - 1]
+
+    def values(self) -> np.ndarray:
+        """Buffered values, oldest first (a copy)."""
+        if not self.full():
+            return self.data[:self.count].copy()
+        return np.concatenate((self.data[self.index:], self.data[:self.index]))
+
+
+class RollingWindow:
+    """Mean and variance over the last size values, updated in O(1) per value.
+
+    Welford's update while the window fills, then a sliding update that
+    replaces the oldest value, so no tick rescans the window. Rounding drift
+    is cleared by an exact recompute every resync values, which is O(1)
+    amortised.
+    """
+    def __init__(self, size: int, resync: int = 100000):
+        self.buffer = RingBuffer(size)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.resync = max(resync, size)
+        self.updates = 0
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def full(self) -> bool:
+        return self.buffer.full()
+
+    def append(self, value: float) -> None:
+        if self.buffer.full():
+            old = self.buffer.oldest()
+            mean = self.mean + (value - old) / self.buffer.size
+            self.m2 += (value - old) * (value - mean + old - self.mean)
+            self.mean = mean
+        else:
+            delta = value - self.mean
+            self.mean += delta / (len(self.buffer) + 1)
+            self.m2 += delta * (value - self.mean)
+        self.buffer.append(value)
+        self.updates += 1
+        if self.updates % self.resync == 0:
+            values = self.buffer.values()
+            self.mean = values.mean()
+            self.m2 = ((values - self.mean) ** 2).sum()
+
+    def variance(self, ddof: int = 0) -> float:
+        """Window variance; ddof=0 matches np.var."""
+        n = len(self.buffer)
+        return max(self.m2, 0.0) / (n - ddof) if n > ddof else 0.0
+
+    def std(self, ddof: int = 0) -> float:
+        return math.sqrt(self.variance(ddof))
+
+
+class EWMAVolatility:
+    """Exponentially weighted variance of log returns, with the given half-life in updates.
+
+    The average starts from zero, so it is divided by 1 - decay**count, the
+    total weight given to the returns seen so far; otherwise the first
+    updates would understate the variance.
+    """
+    def __init__(self, halflife: float = 50.0):
+        self.decay = 0.5 ** (1.0 / halflife)
+        self.variance = 0.0
+        self.weighted = 0.0
+        self.remaining = 1.0
+        self.last_price = None
+        self.count = 0
+
+    def update(self, price: float) -> float:
+        """Feed the next price; returns the updated, bias-corrected variance of returns."""
+        if self.last_price is not None and price > 0 and self.last_price > 0:
+            ret = math.log(price / self.last_price)
+            self.weighted = self.decay * self.weighted + (1 - self.decay) * ret * ret
+            # remaining = decay**count, kept as a running product
+            self.remaining *= self.decay
+            self.variance = self.weighted / (1 - self.remaining)
+            self.count += 1
+        self.last_price = price
+        return self.variance
+
+    def volatility(self) -> float:
+        return math.sqrt(self.variance)
+
+
+def book_imbalance(bid_volumes: List[int], ask_volumes: List[int], depth: int = 5) -> float:
+    """(bid - ask) / (bid + ask) volume over the top depth levels, in [-1, 1]."""
+    bid = sum(bid_volumes[:depth])
+    ask = sum(ask_volumes[:depth])
+    return (bid - ask) / (bid + ask) if bid + ask > 0 else 0.0
+
+
+class BookStatistics:
+    """Rolling order-book statistics for one instrument, constant cost per update.
+
+    Keeps the last history best bid/ask prices and total volumes in ring
+    buffers, the mid-price variance over the last lookback mids, an EWMA
+    volatility of mid returns and the rolling mean of the book imbalance.
+    """
+    def __init__(self, lookback: int = 10, history: int = 1000, halflife: float = 50.0, depth: int = 5):
+        self.mid_prices = RollingWindow(lookback)
+        self.bid_prices = RingBuffer(history)
+        self.ask_prices = RingBuffer(history)
+        self.bid_volume = RingBuffer(history)
+        self.ask_volume = RingBuffer(history)
+        self.ewma = EWMAVolatility(halflife)
+        self.imbalance = RollingWindow(lookback)
+        self.depth = depth
+
+    def update_mid(self, mid: float) -> None:
+        self.mid_prices.append(mid)
+        self.ewma.update(mid)
+
+    def update_book(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
+                    bid_volumes: List[int]) -> None:
+        """Record the top of book, the total volumes and the imbalance of one snapshot."""
+        self.bid_prices.append(bid_prices[0])
+        self.ask_prices.append(ask_prices[0])
+        self.bid_volume.append(sum(bid_volumes))
+        self.ask_volume.append(sum(ask_volumes))
+        self.imbalance.append(book_imbalance(bid_volumes, ask_volumes, self.depth))
+
+    def mid_variance(self) -> float:
+        return self.mid_prices.variance()
+
+
+if __name__ == '__main__':
+    import time
+    rng = np.random.default_rng(0)
+    mids = 100 + np.cumsum(rng.normal(0, 0.05, 200000))
+    window = RollingWindow(10)
+    start = time.perf_counter()
+    for mid in mids:
+        window.append(mid)
+    print(f"{len(mids) / (time.perf_counter() - start):.0f} updates/s", window.variance(), np.var(mids[-10:]))
@@ -1,4 +1,4 @@
-from AmericanStrats import BinomialPricing, MonteCalroPricing
+from AmericanStrats import BinomialPricing, MonteCarloPricing
 
 
 class AmericanCall:
@@ -27,6 +27,6 @@ class AmericanCall:
 
 if __name__ == '__main__':
     bp = BinomialPricing()
-    mc = MonteCalroPricing()
+    mc = MonteCarloPricing()
     call = AmericanCall(100, 102, 1, 0.03, 0.2, mc)
     print(call.price())
\ No newline at end of file
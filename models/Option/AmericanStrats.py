@@ -1,56 +1,189 @@
 import numpy as np
 from strats_base import OptionPricingStrats
+from EuroStrats import BlackScholesPricing
+from PathGenerator import GBMPathGenerator
 
 
 class BinomialPricing(OptionPricingStrats):
     """Binomial pricing model pricing strategy"""
-    def calculate_price(self, S0, K, T, r, sigma, m=1000):
+    def calculate_tree(self, S0, K, T, r, sigma, m=1000, otype="call", smooth=False):
+        """Vectorised early-exercise recursion over a CRR tree.
+
+        Inputs broadcast to a chain of contracts. The node values and the
+        node stock prices are each one row per contract, rolled back in
+        place: stepping back multiplies the stock row by d, so the intrinsic
+        value at every step comes from the same vector. With smooth=True the
+        last step uses Black-Scholes values (the BBS tree), which removes the
+        odd/even oscillation in m.
+        """
+        S0, K, T, r, sigma = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (S0, K, T, r, sigma)))
+        shape = S0.shape
+        S0, K, T, r, sigma = (x.reshape(-1, 1) for x in (S0, K, T, r, sigma))
+        is_put = np.broadcast_to(np.asarray(otype) == "put", shape).reshape(-1, 1)
+        sign = np.where(is_put, -1.0, 1.0)
+
         dt = T / m
+        df = np.exp(-r * dt)
         u = np.exp(sigma * np.sqrt(dt))
         d = 1 / u
-        df = np.exp(-r * dt)
         p = (np.exp(r * dt) - d) / (u - d)
-        V = np.zeros(m + 1)
-
-        for i in range(m + 1):
-            V[i] = max(S0 * u ** (2 * i - m) - K, 0)
-        for n in range(m - 1, -1, -1):
-            for j in range(n + 1):
-                V[j] = max(df * (p * V[j+1] + (1 - p) * V[j]), max(S0 * u ** (2 * j - n) - K, 0))
-
-        return V[0]
+        up, down = p * df, (1 - p) * df
+
+        steps = m - 1 if smooth else m
+        S = S0 * u ** (steps - 2 * np.arange(steps + 1))
+        V = np.maximum(sign * (S - K), 0)
+        if smooth:
+            european = BlackScholesPricing().calculate_chain(S, K, dt, r, sigma, np.where(is_put, "put", "call"))
+            np.maximum(V, european["price"], out=V)
+
+        scratch = np.empty_like(V)
+        for t in range(steps - 1, -1, -1):
+            np.multiply(V[:, 1:t + 2], down, out=scratch[:, :t + 1])
+            V[:, :t + 1] *= up
+            V[:, :t + 1] += scratch[:, :t + 1]
+            S[:, :t + 1] *= d
+            np.subtract(S[:, :t + 1], K, out=scratch[:, :t + 1])
+            scratch[:, :t + 1] *= sign
+            np.maximum(V[:, :t + 1], scratch[:, :t + 1], out=V[:, :t + 1])
+        return V[:, 0].reshape(shape)[()]
+
+    def calculate_price(self, S0, K, T, r, sigma, m=1000, otype="call", richardson=False):
+        """American option price.
+
+        With richardson=True the BBS tree is evaluated at m and m // 2 steps
+        and extrapolated as 2 * P(m) - P(m // 2), which reaches the accuracy
+        of a much larger plain tree.
+        """
+        if not richardson:
+            return self.calculate_tree(S0, K, T, r, sigma, m, otype)
+        fine = self.calculate_tree(S0, K, T, r, sigma, m, otype, smooth=True)
+        coarse = self.calculate_tree(S0, K, T, r, sigma, m // 2, otype, smooth=True)
+        return 2 * fine - coarse
 
 
 class MonteCarloPricing(OptionPricingStrats):
     """Monte Carlo LS pricing model pricing strategy"""
-    def calculate_price(self, S0, K, T, r, sigma, m=2440, n=10000):
+    def calculate_price(self, S0, K, T, r, sigma, m=2440, n=10000, otype="call", exercise_dates=None,
+                        degree=4, max_memory=2 ** 28, seed=None, method="pcg64", antithetic=False):
+        return self.calculate(S0, K, T, r, sigma, m, n, otype, exercise_dates, degree, max_memory, seed,
+                              method, antithetic)["price"]
+
+    def calculate(self, S0, K, T, r, sigma, m=2440, n=10000, otype="call", exercise_dates=None,
+                  degree=4, max_memory=2 ** 28, seed=None, method="pcg64", antithetic=False):
+        """Longstaff-Schwartz valuation with bounded memory.
+
+        exercise_dates is None (every simulation step), an int number of
+        evenly spaced dates, or an array of times in (0, T]. The exercise
+        boundary is regressed on a training set holding the stock price at
+        the exercise dates only. The price is then estimated on n fresh paths
+        from GBMPathGenerator, drawn in blocks. During training, half of
+        max_memory holds the training set and the other half its path
+        blocks; during pricing, the path blocks and the exercise-date copies
+        of each block share all of it. The scrambling matrices of the Sobol
+        engine are a fixed cost outside max_memory. Dates with too few
+        in-the-money training paths to regress on are never exercised. With
+        antithetic=True, n counts antithetic pairs. Returns price, std_error
+        and the biased in-sample training estimate.
+        """
+        generator = GBMPathGenerator(S0, T, r, sigma, m, method=method, seed=seed, antithetic=antithetic)
         dt = T / m
-        df = np.exp(-r * dt)
-        z = np.random.randn(m, n)
-        M = np.shape(z)[0]
-        S = np.zeros((M, m + 1))
-        S[:, 0] = S0
-
-        for i in range(m):
-            S[:, i + 1] = S[:, i] * np.exp((r - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * z[:, i])
-
-        h = np.maximum(S - K, 0)
-        V = np.copy(h)
-
-        for t in range(m - 1, 0, -1):
-            reg = np.polyfit(S[:, t], V[:, t + 1] * df, 4)
-            C = np.polyval(reg, S[:, t])
-            V[:, t] = np.where(C > h[:, t], V[:, t + 1] * df, h[:, t])
-
-        val = df * sum(V[:, 1]) / M
-        return val
-
-
-
-
-
-
-
+        steps = self.exercise_steps(T, m, exercise_dates)
+        sign = -1.0 if otype == "put" else 1.0
+
+        # training set, regression basis and lstsq copies, per path
+        n_train = int(min(n, max_memory // 2 // (8 * (len(steps) + 2 * degree + 8))))
+        n_train -= n_train % 2 if antithetic else 0
+        if n_train <= degree:
+            raise ValueError("max_memory is too small for the training set")
+        betas, fitted, in_sample = self._fit_boundary(generator, K, r, dt, steps, n_train, sign, degree,
+                                                      max_memory // 2)
+
+        discount = np.exp(-r * steps * dt)
+        # running count, mean and sum of squared deviations, merged block by block
+        count, price, m2 = 0, 0.0, 0.0
+        for S in self._states(generator, steps, 2 * n if antithetic else n, max_memory, degree):
+            size = S.shape[1]
+            value = np.zeros(size)
+            alive = np.ones(size, dtype=bool)
+            basis = np.empty((size, degree + 1))
+            for k in range(len(steps)):
+                if k < len(steps) - 1 and not fitted[k]:
+                    continue
+                payoff = np.maximum(sign * (S[k] - K), 0)
+                index = np.flatnonzero(alive & (payoff > 0))
+                if k < len(steps) - 1:
+                    continuation = self._basis(S[k, index] / K, basis[:len(index)]) @ betas[k]
+                    index = index[payoff[index] >= continuation]
+                value[index] = payoff[index] * discount[k]
+                alive[index] = False
+            samples = generator.combine(value)
+            block_mean = samples.mean()
+            delta = block_mean - price
+            count += len(samples)
+            price += delta * len(samples) / count
+            m2 += ((samples - block_mean) ** 2).sum() + delta ** 2 * (count - len(samples)) * len(samples) / count
+
+        std_error = np.sqrt(m2 / (count - 1) / count)
+        return {"price": price, "std_error": std_error, "in_sample": in_sample}
+
+    def exercise_steps(self, T, m, exercise_dates=None):
+        """Simulation step index of each exercise date; maturity is always included."""
+        if exercise_dates is None:
+            steps = np.arange(1, m + 1)
+        elif np.isscalar(exercise_dates):
+            steps = np.round(np.linspace(0, m, int(exercise_dates) + 1)[1:]).astype(int)
+        else:
+            steps = np.clip(np.round(np.asarray(exercise_dates) / T * m).astype(int), 1, m)
+        return np.unique(np.append(steps, m))
+
+    def _states(self, generator, steps, n, max_memory, degree):
+        """Yield the stock price at the exercise steps, shape (len(steps), paths), one path block at a time.
+
+        The generator gets the share of max_memory left once the per-path
+        pricing arrays and three exercise-date copies are counted: the
+        gathered block, its exponential, and the caller's previous block,
+        which is still alive while the next one is drawn.
+        """
+        path_bytes = 6 * (generator.m + 1)
+        share = int(max_memory * path_bytes / (path_bytes + 3 * len(steps) + degree + 8))
+        for log_S in generator.log_path_blocks(n, share):
+            yield np.exp(log_S[:, steps].T)
+
+    def _basis(self, x, out):
+        """Fill out with the polynomial basis 1, x, x^2, ... in place."""
+        out[:, 0] = 1
+        for j in range(1, out.shape[1]):
+            np.multiply(out[:, j - 1], x, out=out[:, j])
+        return out
+
+    def _fit_boundary(self, generator, K, r, dt, steps, n, sign, degree, max_memory):
+        """Backward induction on the training paths; regression only on in-the-money paths.
+
+        fitted[k] is False for dates with at most degree in-the-money
+        paths, where no regression is run and no path is exercised.
+        """
+        S = np.empty((len(steps), n))
+        start = 0
+        for state in self._states(generator, steps, n, max_memory, degree):
+            S[:, start:start + state.shape[1]] = state
+            start += state.shape[1]
+        cashflow = np.maximum(sign * (S[-1] - K), 0)
+        basis = np.empty((n, degree + 1))
+        betas = np.zeros((len(steps) - 1, degree + 1))
+        fitted = np.zeros(len(steps) - 1, dtype=bool)
+        for k in range(len(steps) - 2, -1, -1):
+            cashflow *= np.exp(-r * (steps[k + 1] - steps[k]) * dt)
+            payoff = np.maximum(sign * (S[k] - K), 0)
+            itm = np.flatnonzero(payoff > 0)
+            if len(itm) <= degree:
+                continue
+            X = self._basis(S[k, itm] / K, basis[:len(itm)])
+            betas[k] = np.linalg.lstsq(X, cashflow[itm], rcond=None)[0]
+            fitted[k] = True
+            exercise = itm[payoff[itm] >= X @ betas[k]]
+            cashflow[exercise] = payoff[exercise]
+        in_sample = np.exp(-r * steps[0] * dt) * cashflow.mean()
+        return betas, fitted, in_sample
 
 
 if __name__ == '__main__':
@@ -1,4 +1,4 @@
-from AsianStrats import MonteCalroPricing
+from AsianStrats import MonteCarloPricing
 
 
 class AsianCall:
@@ -26,6 +26,6 @@ class AsianCall:
 
 
 if __name__ == '__main__':
-    mc = MonteCalroPricing()
+    mc = MonteCarloPricing()
     call = AsianCall(100, 100, 1, 0.05, 0.3, mc)
     print(call.price())
\ No newline at end of file
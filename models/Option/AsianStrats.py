@@ -1,6 +1,7 @@
 import numpy as np
-from scipy.stats import norm
+from scipy.special import ndtr
 from strats_base import OptionPricingStrats
+from PathGenerator import GBMPathGenerator
 
 
 class MonteCarloPricing(OptionPricingStrats):
@@ -12,23 +13,57 @@ class MonteCarloPricing(OptionPricingStrats):
     #     price = np.exp(-r * T) * np.sum(hT) / n
     #     return price
 
-    def calculate_price(self, S0, K, T, r, sigma, m=100, n=5000):
-        deltaT = T / m  # time interval
-        S = np.zeros((n, m + 1))
-        A = np.zeros((n, m + 1))
-        V1 = np.zeros((n, 1))
-        for i in range(0, n):
-            S[i, 0] = S0
-            A[i, 0] = S0
-            for j in range(1, m + 1):
-                S[i, j] = S[i, j - 1] * np.exp((r - 0.5 * sigma ** 2) * deltaT + sigma * np.sqrt(deltaT) * np.random.randn())
-                A[i, j] = A[i, j - 1] + S[i, j]
-            V1[i] = + np.exp(-r * T) * max(A[i, m] / (m + 1) - K, 0)
-        
-        price = sum(V1) / n
-        return price
+    def calculate_price(self, S0, K, T, r, sigma, m=100, n=5000, otype="call", antithetic=True,
+                        control_variate=True, seed=None, max_memory=2 ** 26, method="pcg64"):
+        return self.calculate(S0, K, T, r, sigma, m, n, otype, antithetic, control_variate, seed, max_memory,
+                              method)["price"]
+
+    def calculate(self, S0, K, T, r, sigma, m=100, n=5000, otype="call", antithetic=True,
+                  control_variate=True, seed=None, max_memory=2 ** 26, method="pcg64"):
+        """Arithmetic-average Asian option over the m + 1 fixings S0, S1, ..., Sm.
+
+        Path blocks come from GBMPathGenerator and are averaged with a
+        cumulative sum along the time axis. With antithetic=True, n counts
+        antithetic pairs, each pair averaged into one sample. With
+        control_variate=True, the discrete geometric-average option, whose
+        price is known in closed form, is used as a control with the
+        estimated optimal coefficient. Returns price and std_error.
+        """
+        generator = GBMPathGenerator(S0, T, r, sigma, m, method=method, seed=seed, antithetic=antithetic)
+        sign = -1.0 if otype == "put" else 1.0
+        df = np.exp(-r * T)
+
+        arithmetic, geometric = [], []
+        for log_S in generator.log_path_blocks(2 * n if antithetic else n, max_memory):
+            A = np.exp(log_S).sum(axis=1) / (m + 1)
+            G = np.exp(log_S.sum(axis=1) / (m + 1))
+            arithmetic.append(generator.combine(df * np.maximum(sign * (A - K), 0)))
+            geometric.append(generator.combine(df * np.maximum(sign * (G - K), 0)))
+        arithmetic = np.concatenate(arithmetic)
+        geometric = np.concatenate(geometric)
+
+        samples = arithmetic
+        if control_variate:
+            covariance = np.cov(arithmetic, geometric)
+            b = covariance[0, 1] / covariance[1, 1] if covariance[1, 1] > 0 else 0.0
+            samples = arithmetic - b * (geometric - self.geometric_price(S0, K, T, r, sigma, m, otype))
+        price = samples.mean()
+        std_error = samples.std(ddof=1) / np.sqrt(len(samples))
+        return {"price": price, "std_error": std_error}
+
+    def geometric_price(self, S0, K, T, r, sigma, m=100, otype="call"):
+        """Closed-form price of the discrete geometric-average option on the m + 1 fixings."""
+        mu = np.log(S0) + (r - 0.5 * sigma ** 2) * T / 2
+        var = sigma ** 2 * T * (2 * m + 1) / (6 * (m + 1))
+        sd = np.sqrt(var)
+        d1 = (mu - np.log(K) + var) / sd
+        d2 = d1 - sd
+        forward = np.exp(mu + 0.5 * var)
+        if otype == "put":
+            return np.exp(-r * T) * (K * ndtr(-d2) - forward * ndtr(-d1))
+        return np.exp(-r * T) * (forward * ndtr(d1) - K * ndtr(d2))
     
 
 if __name__ == '__main__':
     mc = MonteCarloPricing()
-    print(mc.calculate_price(100, 103, 1, 0.05, 0.3, 100, 10000))
\ No newline at end of file
+    print(mc.calculate_price(100, 103, 1, 0.05, 0.3, 100, 10000))
@@ -1,27 +1,84 @@
 import numpy as np
+from scipy.special import ndtr
 from strats_base import OptionPricingStrats
+from PathGenerator import GBMPathGenerator
+
+
+class AnalyticPricing(OptionPricingStrats):
+    """Closed-form digital option pricing strategy"""
+    def calculate_chain(self, S0, K, T, r, sigma, R1=1.0, R2=0.0, payoff="cash"):
+        """Price and Greeks of digitals paying R1 if S_T > K and R2 if S_T < K.
+
+        payoff="cash" pays the amounts themselves (cash-or-nothing);
+        payoff="asset" pays R1 * S_T or R2 * S_T (asset-or-nothing). All
+        inputs broadcast, so a strike ladder or a set of payoffs is one call.
+        Returns a dict of arrays: price, delta, gamma, theta, rho, vega.
+        """
+        S0, K, T, r, sigma, R1, R2 = np.broadcast_arrays(
+            *(np.asarray(x, dtype=np.float64) for x in (S0, K, T, r, sigma, R1, R2)))
+        sqrt_T = np.sqrt(T)
+        sigma_sqrt_T = sigma * sqrt_T
+        log_moneyness = np.log(S0 / K)
+        d1 = (log_moneyness + (r + 0.5 * sigma ** 2) * T) / sigma_sqrt_T
+        d2 = d1 - sigma_sqrt_T
+        spread = R1 - R2
+
+        if payoff == "asset":
+            nd1 = np.exp(-0.5 * d1 ** 2) / np.sqrt(2 * np.pi)
+            price = S0 * (R2 + spread * ndtr(d1))
+            delta = R2 + spread * (ndtr(d1) + nd1 / sigma_sqrt_T)
+            gamma = -spread * nd1 * d2 / (S0 * sigma ** 2 * T)
+            vega = -S0 * spread * nd1 * d2 / sigma
+            rho = S0 * spread * nd1 * sqrt_T / sigma
+            theta = -S0 * spread * nd1 * ((r + 0.5 * sigma ** 2) * T - log_moneyness) / (2 * sigma * T * sqrt_T)
+        else:
+            df = np.exp(-r * T)
+            nd2 = np.exp(-0.5 * d2 ** 2) / np.sqrt(2 * np.pi)
+            price = df * (R2 + spread * ndtr(d2))
+            delta = df * spread * nd2 / (S0 * sigma_sqrt_T)
+            gamma = -df * spread * nd2 * d1 / (S0 ** 2 * sigma ** 2 * T)
+            vega = -df * spread * nd2 * d1 / sigma
+            rho = -T * price + df * spread * nd2 * sqrt_T / sigma
+            theta = r * price - df * spread * nd2 * ((r - 0.5 * sigma ** 2) * T - log_moneyness) / (2 * sigma * T * sqrt_T)
+        return {"price": price, "delta": delta, "gamma": gamma, "theta": theta, "rho": rho, "vega": vega}
+
+    def calculate_price(self, S0, K, T, r, sigma, R1=1.0, R2=0.0, payoff="cash"):
+        return self.calculate_chain(S0, K, T, r, sigma, R1, R2, payoff)["price"][()]
+
+    def greeks(self, S0, K, T, r, sigma, R1=1.0, R2=0.0, payoff="cash"):
+        chain = self.calculate_chain(S0, K, T, r, sigma, R1, R2, payoff)
+        return {name: chain[name][()] for name in ("delta", "gamma", "theta", "rho", "vega")}
 
 
 class MonteCarloPricing(OptionPricingStrats):
     """Monte Carlo pricing model pricing strategy"""
-    def calculate_price(self, S0, K, T, r, sigma, R1, R2, m=252, n=10000):
-        dt = T / m
-        z = np.random.randn(n, m)
-        payoff = np.zeros(n)
-
-        for i in range(n):
-            S = S0
-            for j in range(m):
-                S = S * np.exp((r - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * z[i, j])
-            if S > K:
-                payoff[i] = R1
-            elif S < K:
-                payoff[i] = R2
-        
-        v = sum(payoff) * np.exp(-r * T) / n 
-        return v
+    def calculate_price(self, S0, K, T, r, sigma, R1, R2, m=252, n=10000, payoff="cash", seed=None,
+                        method="pcg64", antithetic=False):
+        return self.calculate(S0, K, T, r, sigma, R1, R2, m, n, payoff, seed, method, antithetic)["price"]
+
+    def calculate(self, S0, K, T, r, sigma, R1, R2, m=252, n=10000, payoff="cash", seed=None,
+                  method="pcg64", antithetic=False):
+        """Terminal-only Monte Carlo: the payoff depends on S_T alone, so S_T
+        is drawn exactly in one step and m is not used. K, R1 and R2 may be
+        arrays; every strike is valued against the same n draws. With
+        antithetic=True, n counts antithetic pairs.
+        Returns price and std_error, shaped like the broadcast K/R1/R2.
+        """
+        generator = GBMPathGenerator(S0, T, r, sigma, 1, method=method, seed=seed, antithetic=antithetic)
+        K, R1, R2 = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (K, R1, R2)))
+        paths = 2 * n if antithetic else n
+        ST = np.concatenate([S[:, -1] for S in generator.path_blocks(paths)])
+        ST = ST.reshape((paths,) + (1,) * K.ndim)
+        scale = ST if payoff == "asset" else 1.0
+        values = generator.combine(np.exp(-r * T) * scale * (R1 * (ST > K) + R2 * (ST < K)))
+        price = values.mean(axis=0)
+        std_error = values.std(axis=0, ddof=1) / np.sqrt(n)
+        return {"price": price[()], "std_error": std_error[()]}
     
 
 if __name__ == '__main__':
     mc = MonteCarloPricing()
-    print(mc.calculate_price(100, 101, 1, 0.05, 0.3, 0, 1))
\ No newline at end of file
+    print(mc.calculate_price(100, 101, 1, 0.05, 0.3, 0, 1))
+    analytic = AnalyticPricing()
+    print(analytic.calculate_price(100, 101, 1, 0.05, 0.3, 0, 1))
+    print(analytic.calculate_chain(100, np.arange(80, 125, 5), 1, 0.05, 0.3)["price"])
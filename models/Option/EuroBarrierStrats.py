@@ -1,30 +1,109 @@
 import numpy as np
 from strats_base import OptionPricingStrats
+from PathGenerator import GBMPathGenerator
+
+
+def survival_probability(log_S, barrier, up, var_dt, bridge=True):
+    """Probability that each path never touched the barrier.
+
+    Between two monitoring points the log price is a Brownian bridge, which
+    crosses a level at distances a and b (both on the safe side) with
+    probability exp(-2ab / (sigma^2 dt)). Multiplying the per-step survival
+    probabilities gives continuous monitoring on a coarse grid. With
+    bridge=False only the grid points are checked.
+    """
+    distance = np.log(barrier) - log_S if up else log_S - np.log(barrier)
+    crossed = (distance <= 0).any(axis=1)
+    if not bridge:
+        return (~crossed).astype(np.float64)
+    distance = np.maximum(distance, 0)
+    with np.errstate(divide="ignore"):
+        log_survival = np.log1p(-np.exp(-2 * distance[:, :-1] * distance[:, 1:] / var_dt)).sum(axis=1)
+    return np.where(crossed, 0.0, np.exp(log_survival))
 
 
 class MonteCarloPricing(OptionPricingStrats):
     """Monte Carlo pricing model pricing strategy"""
-    def calculate_price(self, S0, T, r, sigma, KU, KL, BU, BL, R1, R2, m=252, n=10000):
-        dt = T / m
-        z = np.random.randn(n, m)
-        payoff = np.zeros(n)
-        S = np.zeros((n, m + 1))
+    def calculate_price(self, S0, T, r, sigma, KU, KL, BU, BL, R1, R2, m=252, n=10000, seed=None,
+                        bridge=True, max_memory=2 ** 26, method="pcg64"):
+        return self.calculate(S0, T, r, sigma, KU, KL, BU, BL, R1, R2, m, n, seed, bridge, max_memory,
+                              method)["price"]
+
+    def calculate(self, S0, T, r, sigma, KU, KL, BU, BL, R1, R2, m=252, n=10000, seed=None,
+                  bridge=True, max_memory=2 ** 26, method="pcg64"):
+        """Double-barrier note: while S stays inside (BL, BU) it pays
+        max(S_T - KU, 0) + max(KL - S_T, 0) + R2, otherwise R1 + R2.
+
+        The barriers are monitored along the whole path with a Brownian-bridge
+        correction, and each path contributes its expected payoff given its
+        survival probability instead of a 0/1 knock-out.
+        Returns price and std_error.
+        """
+        generator = GBMPathGenerator(S0, T, r, sigma, m, method=method, seed=seed)
+        var_dt = sigma ** 2 * T / m
+        df = np.exp(-r * T)
+        total = total_sq = 0.0
+        for log_S in generator.log_path_blocks(n, max_memory):
+            survival = survival_probability(log_S, BU, True, var_dt, bridge) \
+                * survival_probability(log_S, BL, False, var_dt, bridge)
+            ST = np.exp(log_S[:, -1])
+            inside = np.maximum(ST - KU, 0) + np.maximum(KL - ST, 0) + R2
+            value = df * (survival * inside + (1 - survival) * (R1 + R2))
+            total += value.sum()
+            total_sq += (value ** 2).sum()
+
+        price = total / n
+        std_error = np.sqrt(max(total_sq / n - price ** 2, 0) / n)
+        return {"price": price, "std_error": std_error}
 
-        for i in range(n):
-            S[i, 0] = S0
-            for j in range(m):
-                S[i, j + 1] = S[i, j] * np.exp((r - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * z[i, j])
-            if S[i, m] > BL and S[i, m] < BU:
-                payoff[i] = max(S[i, m] - KU, 0) + max(KL - S[i, m], 0) + R2
-            elif S[i, m] <= BL or S[i, m] >= BU:
-                payoff[i] = R1 + R2
 
-        v = sum(payoff) / n * np.exp(-r * T)
-        return v
+class BarrierPricing(OptionPricingStrats):
+    """Monte Carlo single-barrier option pricing strategy with Brownian-bridge monitoring"""
+    barrier_types = ("up-and-out", "up-and-in", "down-and-out", "down-and-in")
+
+    def calculate_price(self, S0, K, T, r, sigma, B, barrier="up-and-out", otype="call", rebate=0.0,
+                        m=252, n=10000, seed=None, bridge=True, max_memory=2 ** 26, method="pcg64",
+                        antithetic=False):
+        return self.calculate(S0, K, T, r, sigma, B, barrier, otype, rebate, m, n, seed, bridge, max_memory,
+                              method, antithetic)["price"]
+
+    def calculate(self, S0, K, T, r, sigma, B, barrier="up-and-out", otype="call", rebate=0.0,
+                  m=252, n=10000, seed=None, bridge=True, max_memory=2 ** 26, method="pcg64",
+                  antithetic=False):
+        """Knock-in/knock-out, up/down barrier options.
+
+        The rebate is paid at expiry: on knock-out for "out" options, and when
+        the barrier is never touched for "in" options. With antithetic=True,
+        n counts antithetic pairs. Returns price and std_error.
+        """
+        if barrier not in self.barrier_types:
+            raise ValueError(f"barrier must be one of {self.barrier_types}")
+        generator = GBMPathGenerator(S0, T, r, sigma, m, method=method, seed=seed, antithetic=antithetic)
+        up = barrier.startswith("up")
+        knock_in = barrier.endswith("in")
+        sign = -1.0 if otype == "put" else 1.0
+        var_dt = sigma ** 2 * T / m
+        df = np.exp(-r * T)
+
+        total = total_sq = 0.0
+        for log_S in generator.log_path_blocks(2 * n if antithetic else n, max_memory):
+            survival = survival_probability(log_S, B, up, var_dt, bridge)
+            vanilla = np.maximum(sign * (np.exp(log_S[:, -1]) - K), 0)
+            if knock_in:
+                value = (1 - survival) * vanilla + survival * rebate
+            else:
+                value = survival * vanilla + (1 - survival) * rebate
+            value = df * generator.combine(value)
+            total += value.sum()
+            total_sq += (value ** 2).sum()
+
+        price = total / n
+        std_error = np.sqrt(max(total_sq / n - price ** 2, 0) / n)
+        return {"price": price, "std_error": std_error}
 
 
 if __name__ == '__main__':
     mc = MonteCarloPricing()
     print(mc.calculate_price(6855, 1, 0.036, 0.15, 6855*1.02, 6855*0.98, 6855*1.2, 6855*0.8, 6855*0.05, 6855*0.01)/6855)
-
-        
\ No newline at end of file
+    bp = BarrierPricing()
+    print(bp.calculate(100, 100, 1, 0.05, 0.3, 90, "down-and-out", m=50, n=100000))
@@ -1,106 +1,134 @@
 import numpy as np
-from scipy.stats import norm
+from scipy.special import ndtr
 from strats_base import OptionPricingStrats
 
 
 class BlackScholesPricing(OptionPricingStrats):
     """Black-Scholes-Merton pricing model pricing strategy"""
+    def calculate_chain(self, S0, K, T, r, sigma, otype):
+        """Price and Greeks for a chain of contracts in one pass.
+
+        All inputs broadcast against each other; otype holds "call"/"put"
+        labels. d1, d2, N(d1), N(d2) and n(d1) are computed once and shared.
+        Returns a dict of arrays: price, delta, gamma, theta, rho, vega,
+        plus d1 and d2 for callers that need higher-order terms.
+        """
+        S0, K, T, r, sigma = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (S0, K, T, r, sigma)))
+        is_put = np.asarray(otype) == "put"
+        sqrt_T = np.sqrt(T)
+        sigma_sqrt_T = sigma * sqrt_T
+        d1 = (np.log(S0 / K) + (r + 0.5 * sigma ** 2) * T) / sigma_sqrt_T
+        d2 = d1 - sigma_sqrt_T
+        Nd1 = ndtr(d1)
+        Nd2 = ndtr(d2)
+        nd1 = np.exp(-0.5 * d1 ** 2) / np.sqrt(2 * np.pi)
+        K_df = K * np.exp(-r * T)
+        # put values follow from put-call parity: N(-x) = N(x) - 1
+        price = S0 * Nd1 - K_df * Nd2 + is_put * (K_df - S0)
+        delta = Nd1 - is_put
+        gamma = nd1 / (S0 * sigma_sqrt_T)
+        theta = -S0 * nd1 * sigma / (2 * sqrt_T) - r * K_df * (Nd2 - is_put)
+        rho = K_df * T * (Nd2 - is_put)
+        vega = S0 * nd1 * sqrt_T
+        return {"price": price, "delta": delta, "gamma": gamma, "theta": theta, "rho": rho, "vega": vega,
+                "d1": d1, "d2": d2}
+
+    def greeks(self, S0, K, T, r, sigma, otype):
+        chain = self.calculate_chain(S0, K, T, r, sigma, otype)
+        return {name: chain[name][()] for name in ("delta", "gamma", "theta", "rho", "vega")}
+
     def calculate_price(self, S0, K, T, r, sigma, otype):
-        d1 = (np.log(S0 / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        d2 = d1 - sigma * np.sqrt(T)
-        Nd1 = norm.cdf(d1)
-        Nd2 = norm.cdf(d2)
-        if otype == "call":
-            price = S0 * Nd1 - np.exp(-r * T) * K * Nd2
-        elif otype == "put":
-            price = S0 * Nd1 - np.exp(-r * T) * K * Nd2 + np.exp(-r * T) * K - S0
-        return price
+        return self.calculate_chain(S0, K, T, r, sigma, otype)["price"][()]
 
     def delta(self, S0, K, T, r, sigma, otype):
-        d1 = (np.log(S0 / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        if otype == "call":
-            delta = norm.cdf(d1)
-        elif otype == "put":
-            delta = norm.cdf(d1) - 1
-        return delta
+        return self.calculate_chain(S0, K, T, r, sigma, otype)["delta"][()]
 
     def gamma(self, S0, K, T, r, sigma, otype):
-        d1 = (np.log(S0 / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        gamma = norm.pdf(d1) / (S0 * sigma * np.sqrt(T))
-        return gamma
+        return self.calculate_chain(S0, K, T, r, sigma, otype)["gamma"][()]
 
     def theta(self, S0, K, T, r, sigma, otype):
-        d1 = (np.log(S0 / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        d2 = d1 - sigma * np.sqrt(T)
-        Nd2 = norm.cdf(d2)
-        if otype == "call":
-            theta = -S0 * norm.pdf(d1) * sigma / (2 * np.sqrt(T)) - r * K * np.exp(-r * T) * Nd2
-        elif otype == "put":
-            theta = -S0 * norm.pdf(d1) * sigma / (2 * np.sqrt(T)) + r * K * np.exp(-r * T) * Nd2
-        return theta
+        return self.calculate_chain(S0, K, T, r, sigma, otype)["theta"][()]
     
     def rho(self, S0, K, T, r, sigma, otype):
-        d2 = (np.log(S0 / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        Nd2 = norm.cdf(d2)
-        if otype == "call":
-            rho = K * T * np.exp(-r * T) * Nd2
-        elif otype == "put":
-            rho = -K * T * np.exp(-r * T) * Nd2
-        return rho
+        return self.calculate_chain(S0, K, T, r, sigma, otype)["rho"][()]
     
     def vega(self, S0, K, T, r, sigma, otype):
-        d1 = (np.log(S0 / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        vega = S0 * norm.pdf(d1) * np.sqrt(T)
-        return vega
+        return self.calculate_chain(S0, K, T, r, sigma, otype)["vega"][()]
 
 
 class BinomialTreePricing(OptionPricingStrats):
     """Binomial pricing model pricing strategy"""
-    def calculate_price(self, S0, K, T, r, sigma, otype, m=1000):
+    def calculate_tree(self, S0, K, T, r, sigma, otype, m=1000):
+        """Price, delta, gamma and theta from a single CRR tree pass.
+
+        Inputs broadcast to a chain of contracts. Only one row of m + 1 node
+        values per contract is kept and rolled back in place; the nodes at
+        steps 1 and 2 are captured on the way for the Greeks. With m = 1
+        gamma and theta are nan.
+        """
+        S0, K, T, r, sigma = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (S0, K, T, r, sigma)))
+        shape = S0.shape
+        S0, K, T, r, sigma = (x.reshape(-1, 1) for x in (S0, K, T, r, sigma))
+        is_put = np.broadcast_to(np.asarray(otype) == "put", shape).reshape(-1, 1)
+
         dt = T / m
         df = np.exp(-r * dt)
         u = np.exp(sigma * np.sqrt(dt))
         d = 1 / u
         p = (np.exp(r * dt) - d) / (u - d)
-        # initialize the stock price tree
-        mu = np.arange(m + 1)
-        mu = np.resize(mu, (m + 1, m + 1))
-        md = np.transpose(mu)
-        mu = u ** (mu - md)
-        md = d ** md
-        S = S0 * mu * md
-
-        if otype == "call":
-            V = np.maximum(S - K, 0)
-        else:
-            V = np.maximum(K - S, 0)
-        z = 0
+        up, down = p * df, (1 - p) * df
+
+        # terminal stock prices, all-up node first
+        S = S0 * u ** (m - 2 * np.arange(m + 1))
+        V = np.where(is_put, np.maximum(K - S, 0), np.maximum(S - K, 0))
+        # with m <= 2 the step 1/2 nodes are the terminal row; gamma and theta need step 2
+        V2 = V[:, :3].copy() if m == 2 else np.full((len(V), 3), np.nan)
+        V1 = V[:, :2].copy() if m == 1 else None
+        scratch = np.empty_like(V)
         for t in range(m - 1, -1, -1):
-            V[0:m - z, t] = (p * V[0:m - z, t + 1] + (1 - p) * V[1:m - z + 1, t + 1]) * df
-            z += 1
-        return V[0, 0]
+            np.multiply(V[:, 1:t + 2], down, out=scratch[:, :t + 1])
+            V[:, :t + 1] *= up
+            V[:, :t + 1] += scratch[:, :t + 1]
+            if t == 2:
+                V2 = V[:, :3].copy()
+            elif t == 1:
+                V1 = V[:, :2].copy()
+
+        S1 = S0 * np.hstack([u, d])
+        S2 = S0 * np.hstack([u ** 2, np.ones_like(u), d ** 2])
+        delta = (V1[:, 0] - V1[:, 1]) / (S1[:, 0] - S1[:, 1])
+        gamma = ((V2[:, 0] - V2[:, 1]) / (S2[:, 0] - S2[:, 1]) - (V2[:, 1] - V2[:, 2]) / (S2[:, 1] - S2[:, 2])) \
+                / (0.5 * (S2[:, 0] - S2[:, 2]))
+        theta = (V2[:, 1] - V[:, 0]) / (2 * dt[:, 0])
+        result = {"price": V[:, 0], "delta": delta, "gamma": gamma, "theta": theta}
+        return {name: value.reshape(shape)[()] for name, value in result.items()}
+
+    def calculate_price(self, S0, K, T, r, sigma, otype, m=1000):
+        return self.calculate_tree(S0, K, T, r, sigma, otype, m)["price"]
 
     def delta(self, S0, K, T, r, sigma, otype, m=1000):
-        dt = T / m
-        df = np.exp(-r * dt)
-        u = np.exp(sigma * np.sqrt(dt))
-        d = 1 / u
-        p = (np.exp(r * dt) - d) / (u - d)
-        # initialize the stock price tree
-        mu = np.arange(m + 1)
-        mu = np.resize(mu, (m + 1, m + 1))
-        md = np.transpose(mu)
-        mu = u ** (mu - md)
-        md = d ** md
-        S = S0 * mu * md
-
-        if otype == "call":
-            V = np.maximum(S - K, 0)
-        else:
-            V = np.maximum(K - S, 0)
-        z = 0
-        for t in range(m - 1, -1, -1):
-            V[0:m - z, t] = (p * V[0:m - z, t + 1] + (1 - p) * V[1:m - z + 1, t + 1]) * df
-            z += 1
-        delta = (V[0, 1] - V[1, 1]) / (S[0, 1] - S[1, 1])
-        return delta
+        return self.calculate_tree(S0, K, T, r, sigma, otype, m)["delta"]
+
+    def gamma(self, S0, K, T, r, sigma, otype, m=1000):
+        return self.calculate_tree(S0, K, T, r, sigma, otype, m)["gamma"]
+
+    def theta(self, S0, K, T, r, sigma, otype, m=1000):
+        return self.calculate_tree(S0, K, T, r, sigma, otype, m)["theta"]
+
+    def greeks(self, S0, K, T, r, sigma, otype, m=1000):
+        tree = self.calculate_tree(S0, K, T, r, sigma, otype, m)
+        return {name: tree[name] for name in ("delta", "gamma", "theta")}
+
+
+if __name__ == '__main__':
+    import time
+    bsm = BlackScholesPricing()
+    n = 50000
+    rng = np.random.default_rng(0)
+    K = rng.uniform(80, 120, n)
+    T = rng.uniform(0.05, 2, n)
+    sigma = rng.uniform(0.1, 0.5, n)
+    otype = np.where(rng.random(n) < 0.5, "call", "put")
+    start = time.perf_counter()
+    chain = bsm.calculate_chain(100, K, T, 0.03, sigma, otype)
+    print(f"{n} contracts priced with Greeks in {(time.perf_counter() - start) * 1e3:.1f} ms")
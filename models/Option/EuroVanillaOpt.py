@@ -27,6 +27,13 @@ class EuroVanillaOpt:
                                                     self.otype)
     
     def greeks(self):
+        if hasattr(self.pricing_strats, "greeks"):
+            return self.pricing_strats.greeks(self.S0,
+                                              self.K,
+                                              self.T,
+                                              self.r,
+                                              self.sigma,
+                                              self.otype)
         greeks = {}
         greeks["delta"] = self.pricing_strats.delta(self.S0,
                                                     self.K,
@@ -0,0 +1,215 @@
+import numpy as np
+from scipy.linalg.lapack import dgttrf, dgttrs
+from strats_base import OptionPricingStrats
+
+
+class CrankNicolsonPricing(OptionPricingStrats):
+    """Crank-Nicolson finite-difference pricing strategy.
+
+    Solves the Black-Scholes PDE in x = log(S) on a uniform grid with
+    space_steps intervals, S0 on a node and any barrier on the grid edge,
+    and time_steps steps to expiry. The first rannacher steps are replaced
+    by fully implicit half steps to damp the payoff kink. The tridiagonal
+    systems go to LAPACK (gttrf/gttrs) and are factored once per solve for
+    European payoffs. With american=True early exercise is enforced with a
+    penalty iteration (early_exercise="penalty") or red-black projected SOR
+    (early_exercise="psor").
+    """
+    barrier_types = ("up-and-out", "up-and-in", "down-and-out", "down-and-in")
+
+    def __init__(self, american=False, space_steps=400, time_steps=200, early_exercise="penalty", width=5.0,
+                 rannacher=2):
+        if early_exercise not in ("penalty", "psor"):
+            raise ValueError("early_exercise must be 'penalty' or 'psor'")
+        self.american = american
+        self.space_steps = space_steps
+        self.time_steps = time_steps
+        self.early_exercise = early_exercise
+        self.width = width
+        self.rannacher = rannacher
+
+    def calculate_price(self, S0, K, T, r, sigma, otype="call"):
+        return self.calculate_grid(S0, K, T, r, sigma, otype)["price"]
+
+    def greeks(self, S0, K, T, r, sigma, otype="call"):
+        grid = self.calculate_grid(S0, K, T, r, sigma, otype)
+        return {name: grid[name] for name in ("delta", "gamma", "theta")}
+
+    def calculate_grid(self, S0, K, T, r, sigma, otype="call"):
+        """Price, delta, gamma and theta of a vanilla option from one grid solve."""
+        return self._value(S0, K, T, r, sigma, -1.0 if otype == "put" else 1.0)
+
+    def calculate_barrier(self, S0, K, T, r, sigma, B, barrier="up-and-out", otype="call", rebate=0.0):
+        """Price, delta, gamma and theta of a knock-in/knock-out barrier option.
+
+        The rebate is paid at expiry, as in EuroBarrierStrats.BarrierPricing.
+        Knock-outs are solved on a grid ending at the barrier and the rebate
+        leg is a no-touch claim on the same grid. Knock-ins follow from
+        in-out parity, so they are European only.
+        """
+        if barrier not in self.barrier_types:
+            raise ValueError(f"barrier must be one of {self.barrier_types}")
+        knock_in = barrier.endswith("in")
+        if self.american and (knock_in or rebate):
+            raise ValueError("American barrier options must be knock-out without rebate")
+        up = barrier.startswith("up")
+        sign = -1.0 if otype == "put" else 1.0
+        df = np.exp(-r * T)
+        rebate_leg = {"price": rebate * df, "delta": 0.0, "gamma": 0.0, "theta": r * rebate * df}
+        if (S0 >= B) if up else (S0 <= B):
+            return self.calculate_grid(S0, K, T, r, sigma, otype) if knock_in else rebate_leg
+
+        out = self._value(S0, K, T, r, sigma, sign, B, up)
+        no_touch = self._value(S0, K, T, r, sigma, 0.0, B, up) if rebate else dict.fromkeys(out, 0.0)
+        if knock_in:
+            vanilla = self.calculate_grid(S0, K, T, r, sigma, otype)
+            return {name: vanilla[name] - out[name] + rebate * no_touch[name] for name in out}
+        return {name: out[name] + rebate_leg[name] - rebate * no_touch[name] for name in out}
+
+    def _value(self, S0, K, T, r, sigma, sign, B=None, up=True):
+        """One grid solve; sign is +1 call, -1 put, 0 for a claim paying 1 at expiry."""
+        x, j0 = self._grid(np.log(S0), np.log(K), T, sigma, None if B is None else np.log(B), up)
+        h = x[1] - x[0]
+        S = np.exp(x)
+        payoff = np.maximum(sign * (S - K), 0) if sign else np.ones_like(S)
+        exercise = payoff if self.american and sign else None
+
+        def edges(tau):
+            """Dirichlet values at the two grid edges, tau before expiry."""
+            if sign:
+                lower = max(sign * (S[0] - K * np.exp(-r * tau)), 0) if sign < 0 else 0.0
+                upper = max(sign * (S[-1] - K * np.exp(-r * tau)), 0) if sign > 0 else 0.0
+                if exercise is not None:
+                    lower, upper = max(lower, payoff[0]), max(upper, payoff[-1])
+            else:
+                lower = upper = np.exp(-r * tau)
+            if B is not None:
+                lower, upper = (lower, 0.0) if up else (0.0, upper)
+            return lower, upper
+
+        V, previous, last_step = self._roll_back(payoff, exercise, edges, h, T, r, sigma)
+        V_x = (V[j0 + 1] - V[j0 - 1]) / (2 * h)
+        V_xx = (V[j0 + 1] - 2 * V[j0] + V[j0 - 1]) / h ** 2
+        return {"price": V[j0],
+                "delta": V_x / S0,
+                "gamma": (V_xx - V_x) / S0 ** 2,
+                "theta": (previous[j0] - V[j0]) / last_step}
+
+    def _grid(self, x0, xK, T, sigma, xB, up):
+        """Uniform log-price grid with x0 on a node and the barrier, if any, as an edge."""
+        spread = self.width * sigma * np.sqrt(T)
+        lower, upper = min(x0, xK) - spread, max(x0, xK) + spread
+        if xB is not None:
+            lower, upper = (lower, xB) if up else (xB, upper)
+        m = self.space_steps
+        if xB is not None and up:
+            # count nodes down from the barrier so that it stays on the edge
+            j = min(max(1, int(round((upper - x0) / (upper - lower) * m))), m - 1)
+            return upper - (upper - x0) / j * np.arange(m, -1, -1), m - j
+        j0 = min(max(1, int(round((x0 - lower) / (upper - lower) * m))), m - 1)
+        return lower + (x0 - lower) / j0 * np.arange(m + 1), j0
+
+    def _roll_back(self, payoff, exercise, edges, h, T, r, sigma):
+        """Step the grid values from expiry to today.
+
+        Returns today's values, the values one step later and the length of
+        that last step, which is a half step when all steps are Rannacher steps.
+        """
+        nu = r - 0.5 * sigma ** 2
+        a = 0.5 * sigma ** 2 / h ** 2 - 0.5 * nu / h
+        c = 0.5 * sigma ** 2 / h ** 2 + 0.5 * nu / h
+        b = -sigma ** 2 / h ** 2 - r
+        n = len(payoff) - 2
+        dt = T / self.time_steps
+
+        # at most time_steps Rannacher steps, so the schedule always ends at expiry
+        rannacher = min(self.rannacher, self.time_steps)
+        schedule = [(0.5 * dt, 1.0)] * (2 * rannacher) + [(dt, 0.5)] * (self.time_steps - rannacher)
+        V = payoff.astype(np.float64)
+        previous = V
+        tau = 0.0
+        factor = None
+        for step, theta in schedule:
+            if factor is None or factor[0] != (step, theta):
+                lower = np.full(n - 1, -theta * step * a)
+                diagonal = np.full(n, 1 - theta * step * b)
+                upper = np.full(n - 1, -theta * step * c)
+                factor = ((step, theta), lower, diagonal, upper, dgttrf(lower, diagonal, upper))
+            _, lower, diagonal, upper, lu = factor
+
+            explicit = (1 - theta) * step
+            rhs = V[1:-1] + explicit * (a * V[:-2] + b * V[1:-1] + c * V[2:])
+            tau += step
+            low_edge, high_edge = edges(tau)
+            rhs[0] += theta * step * a * low_edge
+            rhs[-1] += theta * step * c * high_edge
+
+            previous = V
+            V = np.empty_like(previous)
+            V[0], V[-1] = low_edge, high_edge
+            if exercise is None:
+                V[1:-1] = dgttrs(*lu[:5], rhs)[0]
+            elif self.early_exercise == "penalty":
+                V[1:-1] = self._penalty(lower, diagonal, upper, lu, rhs, exercise[1:-1])
+            else:
+                V[1:-1] = self._psor(lower, diagonal, upper, rhs, exercise[1:-1], previous[1:-1])
+        return V, previous, step
+
+    def _penalty(self, lower, diagonal, upper, lu, rhs, exercise, penalty=1e8, max_iter=50):
+        """Penalty iteration: V solves (A + P) V = rhs + P g, P large where V < g."""
+        V = dgttrs(*lu[:5], rhs)[0]
+        active = V < exercise
+        for _ in range(max_iter):
+            if not active.any():
+                break
+            P = penalty * active
+            lu_penalty = dgttrf(lower, diagonal + P, upper)
+            V = dgttrs(*lu_penalty[:5], rhs + P * exercise)[0]
+            updated = V < exercise - 1e-12
+            updated |= active & (V <= exercise + 1e-12)
+            if np.array_equal(updated, active):
+                break
+            active = updated
+        return np.maximum(V, exercise)
+
+    def _psor(self, lower, diagonal, upper, rhs, exercise, guess, omega=1.2, tol=1e-9, max_iter=500):
+        """Red-black projected SOR for A V = rhs subject to V >= g."""
+        V = np.maximum(guess, exercise)
+        lower_full = np.concatenate([[0.0], lower])
+        upper_full = np.concatenate([upper, [0.0]])
+        for _ in range(max_iter):
+            change = 0.0
+            for parity in (0, 1):
+                index = np.arange(parity, len(V), 2)
+                left = np.where(index > 0, V[np.maximum(index - 1, 0)], 0.0)
+                right = np.where(index < len(V) - 1, V[np.minimum(index + 1, len(V) - 1)], 0.0)
+                target = (rhs[index] - lower_full[index] * left - upper_full[index] * right) / diagonal[index]
+                updated = np.maximum(V[index] + omega * (target - V[index]), exercise[index])
+                change = max(change, np.abs(updated - V[index]).max())
+                V[index] = updated
+            if change < tol:
+                break
+        return V
+
+
+if __name__ == '__main__':
+    import time
+    from EuroStrats import BlackScholesPricing
+    from AmericanStrats import BinomialPricing
+    from EuroBarrierStrats import BarrierPricing
+
+    cn = CrankNicolsonPricing()
+    print(cn.calculate_grid(100, 100, 1, 0.05, 0.3, "put"))
+    print(BlackScholesPricing().calculate_chain(100, 100, 1, 0.05, 0.3, "put"))
+
+    for method in ("penalty", "psor"):
+        start = time.perf_counter()
+        print(method, CrankNicolsonPricing(american=True, early_exercise=method).calculate_grid(36, 40, 1, 0.06, 0.2, "put"),
+              time.perf_counter() - start)
+    print(BinomialPricing().calculate_price(36, 40, 1, 0.06, 0.2, 2000, "put", richardson=True))
+
+    start = time.perf_counter()
+    print(cn.calculate_barrier(100, 100, 1, 0.05, 0.3, 90, "down-and-out"), time.perf_counter() - start)
+    start = time.perf_counter()
+    print(BarrierPricing().calculate(100, 100, 1, 0.05, 0.3, 90, "down-and-out", m=252, n=200000, seed=0),
+          time.perf_counter() - start)
@@ -0,0 +1,114 @@
+import numpy as np
+from EuroStrats import BlackScholesPricing
+
+
+class ImpliedVolSolver:
+    """Vectorised Black-Scholes implied volatility solver"""
+    def __init__(self, pricing_strats=None, tol=1e-8, max_iter=50, sigma_min=1e-6, sigma_max=5.0):
+        self.pricing_strats = BlackScholesPricing() if pricing_strats is None else pricing_strats
+        self.tol = tol
+        self.max_iter = max_iter
+        self.sigma_min = sigma_min
+        self.sigma_max = sigma_max
+
+    def bounds(self, S0, K, T, r, otype):
+        """No-arbitrage price bounds for each quote."""
+        K_df = K * np.exp(-r * T)
+        is_put = otype == "put"
+        lower = np.where(is_put, np.maximum(K_df - S0, 0), np.maximum(S0 - K_df, 0))
+        upper = np.where(is_put, K_df, S0)
+        return lower, upper
+
+    def initial_guess(self, price, S0, K, T, r, otype):
+        """Corrado-Miller rational approximation, falling back to Brenner-Subrahmanyam."""
+        K_df = K * np.exp(-r * T)
+        call = np.where(otype == "put", price + S0 - K_df, price)
+        half = call - (S0 - K_df) / 2
+        disc = half ** 2 - (S0 - K_df) ** 2 / np.pi
+        guess = np.sqrt(2 * np.pi / T) / (S0 + K_df) * (half + np.sqrt(np.maximum(disc, 0)))
+        fallback = np.sqrt(2 * np.pi / T) * call / S0
+        guess = np.where((disc > 0) & (guess > 0), guess, fallback)
+        return np.clip(guess, self.sigma_min, self.sigma_max)
+
+    def solve(self, price, S0, K, T, r, otype):
+        """Implied volatilities for a batch of quotes.
+
+        Halley steps are taken inside a per-quote bisection bracket: a step
+        that leaves the bracket is replaced by bisection, so every quote
+        converges. Only unconverged quotes are revalued on each iteration.
+        Returns a dict with sigma (NaN for quotes outside the no-arbitrage
+        bounds), iterations and converged.
+        """
+        price, S0, K, T, r = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (price, S0, K, T, r)))
+        otype = np.broadcast_to(np.asarray(otype), price.shape)
+        shape = price.shape
+        price, S0, K, T, r, otype = (np.ravel(x) for x in (price, S0, K, T, r, otype))
+        n = len(price)
+
+        lower, upper = self.bounds(S0, K, T, r, otype)
+        valid = (price > lower) & (price < upper)
+        sigma = np.full(n, np.nan)
+        iterations = np.zeros(n, dtype=np.int64)
+        converged = np.zeros(n, dtype=bool)
+
+        active = np.flatnonzero(valid)
+        sigma[active] = self.initial_guess(price[active], S0[active], K[active], T[active], r[active], otype[active])
+        lo = np.full(n, self.sigma_min)
+        hi = np.full(n, self.sigma_max)
+
+        for _ in range(self.max_iter):
+            if len(active) == 0:
+                break
+            s = sigma[active]
+            with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+                chain = self.pricing_strats.calculate_chain(S0[active], K[active], T[active], r[active], s, otype[active])
+            diff = chain["price"] - price[active]
+            vega = chain["vega"]
+            iterations[active] += 1
+
+            done = np.abs(diff) < self.tol * np.maximum(1.0, price[active])
+            converged[active[done]] = True
+
+            # price is increasing in sigma, so the sign of diff tightens the bracket
+            lo[active] = np.where(diff < 0, s, lo[active])
+            hi[active] = np.where(diff > 0, s, hi[active])
+
+            with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+                newton = diff / np.where(vega > 0, vega, np.inf)
+                # Halley correction, dropped back to Newton when it would distort the step
+                halley = 1 - 0.5 * newton * chain["d1"] * chain["d2"] / s
+                step = np.where((halley >= 0.5) & (halley <= 2), newton / halley, newton)
+            candidate = s - step
+            outside = ~((candidate > lo[active]) & (candidate < hi[active])) | (vega <= 0)
+            candidate = np.where(outside, 0.5 * (lo[active] + hi[active]), candidate)
+            sigma[active] = np.where(done, s, candidate)
+
+            active = active[~done]
+
+        return {"sigma": sigma.reshape(shape), "iterations": iterations.reshape(shape),
+                "converged": converged.reshape(shape)}
+
+
+if __name__ == '__main__':
+    import time
+    n = 100000
+    rng = np.random.default_rng(0)
+    S0 = 100.0
+    K = rng.uniform(60, 140, n)
+    T = rng.uniform(0.05, 2, n)
+    r = 0.03
+    sigma = rng.uniform(0.05, 0.8, n)
+    otype = np.where(rng.random(n) < 0.5, "call", "put")
+    price = BlackScholesPricing().calculate_chain(S0, K, T, r, sigma, otype)["price"]
+
+    solver = ImpliedVolSolver()
+    start = time.perf_counter()
+    result = solver.solve(price, S0, K, T, r, otype)
+    elapsed = time.perf_counter() - start
+    valid = ~np.isnan(result["sigma"])
+    vega = BlackScholesPricing().calculate_chain(S0, K, T, r, sigma, otype)["vega"]
+    identifiable = valid & (vega > 1e-2)
+    print(f"{n} quotes in {elapsed * 1e3:.0f} ms, "
+          f"{valid.sum()} inside no-arbitrage bounds, converged {result['converged'][valid].mean():.2%}, "
+          f"mean iterations {result['iterations'][valid].mean():.1f}, "
+          f"max sigma error (vega > 1e-2) {np.abs(result['sigma'] - sigma)[identifiable].max():.2e}")
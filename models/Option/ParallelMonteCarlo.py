@@ -0,0 +1,96 @@
+import multiprocessing as mp
+import numpy as np
+from strats_base import OptionPricingStrats
+
+
+def run_batch(strategy, args, kwargs, n, seed):
+    """Value one path batch in a worker; returns the strategy's result dict."""
+    return strategy.calculate(*args, n=n, seed=seed, **kwargs)
+
+
+def _run_batch(job):
+    return run_batch(*job)
+
+
+class ParallelMonteCarlo(OptionPricingStrats):
+    """Process-pool execution layer for Monte Carlo pricing strategies.
+
+    Wraps any strategy whose calculate(..., n=, seed=) returns price and
+    std_error. A valuation of n paths is cut into fixed batches of
+    batch_size paths, each with its own stream spawned from
+    SeedSequence(seed), so the batches, and the way they are combined,
+    do not depend on the number of workers. workers=0 runs in-process.
+    """
+    def __init__(self, strategy, workers:int=None, batch_size:int=2 ** 14):
+        self.strategy = strategy
+        self.workers = mp.cpu_count() if workers is None else workers
+        self.batch_size = batch_size
+        self.pool = None
+
+    def calculate_price(self, *args, **kwargs):
+        return self.calculate(*args, **kwargs)["price"]
+
+    def calculate(self, *args, n=10000, seed=None, target_std_error=None, min_batches=2, **kwargs):
+        """Value n paths (or antithetic pairs) in batches and combine them.
+
+        Batch prices are combined weighted by their path counts, and the
+        standard error is the square root of the weighted sum of batch
+        variances. With target_std_error set, batches are folded in order
+        and the run stops at the first batch, after min_batches, at which the
+        combined standard error is at or below the target; n is then a cap.
+        Returns the combined result dict with n and batches added.
+        """
+        sizes = [min(self.batch_size, n - start) for start in range(0, n, self.batch_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        wave = len(sizes) if target_std_error is None else max(self.workers, 1)
+
+        jobs = [(self.strategy, args, kwargs, size, child) for size, child in zip(sizes, seeds)]
+        count = batches = 0
+        totals = {}
+        variance = 0.0
+        for size, result in zip(sizes, self._results(jobs, wave)):
+            count += size
+            batches += 1
+            for key, value in result.items():
+                if key != "std_error":
+                    totals[key] = totals.get(key, 0.0) + size * value
+            variance = variance + (size * result["std_error"]) ** 2
+            if target_std_error is not None and batches >= min_batches \
+                    and np.all(np.sqrt(variance) / count <= target_std_error):
+                break
+
+        result = {key: total / count for key, total in totals.items()}
+        result["std_error"] = np.sqrt(variance) / count
+        result["n"] = count
+        result["batches"] = batches
+        return result
+
+    def close(self):
+        """Shut the worker pool down."""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def _results(self, jobs, wave):
+        """Yield batch results in batch order, submitting wave batches at a time."""
+        for start in range(0, len(jobs), wave):
+            yield from self._map(jobs[start:start + wave])
+
+    def _map(self, jobs):
+        if self.workers == 0 or len(jobs) == 1:
+            return map(_run_batch, jobs)
+        if self.pool is None:
+            self.pool = mp.Pool(self.workers)
+        return self.pool.imap(_run_batch, jobs)
+
+
+if __name__ == '__main__':
+    import time
+    from AsianStrats import MonteCarloPricing
+    for workers in (0, 2, 4):
+        mc = ParallelMonteCarlo(MonteCarloPricing(), workers=workers)
+        start = time.perf_counter()
+        print(workers, mc.calculate(100, 103, 1, 0.05, 0.3, n=200000, seed=7), time.perf_counter() - start)
+        print(workers, mc.calculate(100, 103, 1, 0.05, 0.3, n=200000, seed=7, target_std_error=0.003))
+        mc.close()
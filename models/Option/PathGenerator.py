@@ -0,0 +1,126 @@
+import warnings
+import numpy as np
+from scipy.special import ndtri
+from scipy.stats import qmc
+
+
+class GBMPathGenerator:
+    """Shared geometric Brownian motion path generator.
+
+    Paths come out in blocks of whole paths whose size is bounded by
+    max_memory, so callers never hold more than one block. Normals are drawn
+    from a seeded PCG64 stream (method="pcg64") or from a scrambled Sobol
+    sequence (method="sobol"). Sobol points are mapped to the path with a
+    Brownian-bridge construction, so the best-distributed dimensions drive
+    the coarse shape of the path. With antithetic=True, the second half of
+    every block mirrors the first half, row for row, and the path count
+    must be even.
+    """
+    methods = ("pcg64", "sobol")
+
+    def __init__(self, S0, T, r, sigma, m, method="pcg64", seed=None, antithetic=False):
+        if method not in self.methods:
+            raise ValueError(f"method must be one of {self.methods}")
+        self.S0 = S0
+        self.T = T
+        self.r = r
+        self.sigma = sigma
+        self.m = m
+        self.dt = T / m
+        self.method = method
+        self.antithetic = antithetic
+        if method == "sobol":
+            self.sobol = qmc.Sobol(d=m, scramble=True, seed=np.random.default_rng(seed))
+            self._bridge = self._bridge_schedule(m)
+        else:
+            self.rng = np.random.Generator(np.random.PCG64(seed))
+
+    def block_size(self, n, max_memory=2 ** 26, temporaries=6):
+        """Paths per block so that a few (paths, m + 1) arrays fit in max_memory."""
+        size = int(max(2, min(n, max_memory // (8 * temporaries * (self.m + 1)))))
+        return size + size % 2 if self.antithetic else size
+
+    def normal_blocks(self, n, max_memory=2 ** 26):
+        """Yield standard normal increments, shape (paths, m), n paths in total.
+
+        With antithetic=True n must be even, so that every block holds whole pairs.
+        """
+        if self.antithetic and n % 2:
+            raise ValueError("n must be even with antithetic=True")
+        size = self.block_size(n, max_memory)
+        for start in range(0, n, size):
+            count = min(size, n - start)
+            z = self._draw(count // 2 if self.antithetic else count)
+            yield np.concatenate([z, -z]) if self.antithetic else z
+
+    def log_path_blocks(self, n, max_memory=2 ** 26):
+        """Yield log price paths, shape (paths, m + 1), starting at log(S0)."""
+        drift = (self.r - 0.5 * self.sigma ** 2) * self.dt
+        vol = self.sigma * np.sqrt(self.dt)
+        for z in self.normal_blocks(n, max_memory):
+            log_S = np.empty((len(z), self.m + 1))
+            log_S[:, 0] = np.log(self.S0)
+            z *= vol
+            z += drift
+            np.cumsum(z, axis=1, out=log_S[:, 1:])
+            log_S[:, 1:] += np.log(self.S0)
+            yield log_S
+
+    def path_blocks(self, n, max_memory=2 ** 26):
+        """Yield price paths, shape (paths, m + 1)."""
+        for log_S in self.log_path_blocks(n, max_memory):
+            yield np.exp(log_S, out=log_S)
+
+    def combine(self, values):
+        """Average antithetic partners so that the samples are independent."""
+        if not self.antithetic:
+            return values
+        half = len(values) // 2
+        return 0.5 * (values[:half] + values[half:2 * half])
+
+    def _draw(self, count):
+        if self.method == "pcg64":
+            return self.rng.standard_normal((count, self.m))
+        with warnings.catch_warnings():
+            # balance warnings for non power-of-two draws
+            warnings.simplefilter("ignore", UserWarning)
+            u = self.sobol.random(count)
+        return self._bridge_increments(ndtri(np.clip(u, 1e-12, 1 - 1e-12)))
+
+    @staticmethod
+    def _bridge_schedule(m):
+        """Construction order of a Brownian bridge on steps 1..m.
+
+        Each entry (i, left, right, w_left, w_right, scale) sets
+        W_i = w_left * W_left + w_right * W_right + scale * z in units of dt,
+        with index 0 standing for W_0 = 0.
+        """
+        schedule = [(m, 0, 0, 0.0, 0.0, np.sqrt(m))]
+        intervals = [(0, m)]
+        while intervals:
+            next_intervals = []
+            for left, right in intervals:
+                if right - left < 2:
+                    continue
+                mid = (left + right) // 2
+                w_left = (right - mid) / (right - left)
+                w_right = (mid - left) / (right - left)
+                scale = np.sqrt((mid - left) * (right - mid) / (right - left))
+                schedule.append((mid, left, right, w_left, w_right, scale))
+                next_intervals += [(left, mid), (mid, right)]
+            intervals = next_intervals
+        return schedule
+
+    def _bridge_increments(self, z):
+        """Turn Sobol normals into per-step standard normal increments."""
+        W = np.zeros((len(z), self.m + 1))
+        for k, (i, left, right, w_left, w_right, scale) in enumerate(self._bridge):
+            W[:, i] = w_left * W[:, left] + w_right * W[:, right] + scale * z[:, k]
+        return np.diff(W, axis=1)
+
+
+if __name__ == '__main__':
+    for method in GBMPathGenerator.methods:
+        generator = GBMPathGenerator(100, 1, 0.05, 0.3, 64, method=method, seed=0, antithetic=True)
+        ST = np.concatenate([S[:, -1] for S in generator.path_blocks(2 ** 14)])
+        print(method, ST.mean(), 100 * np.exp(0.05))
@@ -0,0 +1,171 @@
+import inspect
+import sys
+from collections import OrderedDict
+import numpy as np
+from strats_base import OptionPricingStrats
+
+
+class CachedPricing(OptionPricingStrats):
+    """Memoizing wrapper around a pricing strategy.
+
+    Every public method of the wrapped strategy (calculate_price, greeks,
+    calculate, calculate_chain, delta, ...) is served from an LRU cache keyed
+    by the method name and its arguments. Numbers are rounded to digits
+    significant digits, so nearly identical points, and 100 and 100.0,
+    share an entry. Least recently used entries are evicted once the
+    estimated cache size exceeds max_memory bytes. For strategies with a
+    calculate_chain, calculate_price and greeks are read off the cached
+    chain, so a price followed by its Greeks costs one valuation. Calls with
+    a seed argument left as None are random and are never cached.
+    """
+    greek_names = ("delta", "gamma", "theta", "rho", "vega")
+
+    def __init__(self, strategy, max_memory:int=2 ** 26, digits:int=10):
+        self.strategy = strategy
+        self.max_memory = max_memory
+        self.digits = digits
+        self.entries = OrderedDict()
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self._signatures = {}
+
+    def __getattr__(self, name):
+        # pickle and copy look up dunders before __init__ has set self.strategy
+        if name == "strategy" or name.startswith("_"):
+            raise AttributeError(name)
+        if not callable(getattr(self.strategy, name)):
+            return getattr(self.strategy, name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def calculate_price(self, *args, **kwargs):
+        if hasattr(self.strategy, "calculate_chain"):
+            return self.call("calculate_chain", *args, **kwargs)["price"][()]
+        return self.call("calculate_price", *args, **kwargs)
+
+    def greeks(self, *args, **kwargs):
+        if hasattr(self.strategy, "calculate_chain"):
+            chain = self.call("calculate_chain", *args, **kwargs)
+            return {name: chain[name][()] for name in self.greek_names if name in chain}
+        return self.call("greeks", *args, **kwargs)
+
+    def call(self, name, *args, **kwargs):
+        """Call strategy.name(*args, **kwargs) through the cache."""
+        key = (name, self.quantize(args), self.quantize(kwargs))
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self._copy(entry[0])
+        self.misses += 1
+        arguments = self._bind(name, args, kwargs)
+        if arguments.get("seed", 0) is None:
+            return getattr(self.strategy, name)(*args, **kwargs)
+        value = self._freeze(getattr(self.strategy, name)(*args, **kwargs))
+        size = self.sizeof(value)
+        self.entries[key] = (value, size, arguments)
+        self.memory += size
+        while self.memory > self.max_memory and len(self.entries) > 1:
+            self.memory -= self.entries.popitem(last=False)[1][1]
+        return self._copy(value)
+
+    def invalidate(self, **params):
+        """Drop cached results.
+
+        With no arguments the whole cache is cleared. Otherwise entries whose
+        arguments match any given value are dropped, e.g. invalidate(S0=100)
+        once spot has moved away from 100, or invalidate(sigma=None) to drop
+        every entry that takes a sigma. Returns the number of entries dropped.
+        """
+        if not params:
+            dropped = len(self.entries)
+            self.entries.clear()
+            self.memory = 0
+            return dropped
+        wanted = {param: None if value is None else self.quantize(value) for param, value in params.items()}
+        stale = [key for key, (_, _, arguments) in self.entries.items()
+                 if any(param in arguments and (value is None or self.quantize(arguments[param]) == value)
+                        for param, value in wanted.items())]
+        for key in stale:
+            self.memory -= self.entries.pop(key)[1]
+        return len(stale)
+
+    def stats(self):
+        """Hit/miss counters, hit rate, entry count and estimated memory in bytes."""
+        calls = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / calls if calls else 0.0,
+                "entries": len(self.entries), "memory": self.memory}
+
+    def quantize(self, value):
+        """Hashable key component for value, floats rounded to self.digits significant digits."""
+        if isinstance(value, (float, np.floating)) or isinstance(value, (int, np.integer)) \
+                and not isinstance(value, bool):
+            return "%.*g" % (self.digits, value)
+        if isinstance(value, (list, tuple)):
+            return tuple(map(self.quantize, value))
+        if isinstance(value, np.ndarray):
+            if value.dtype.kind in "fiu":
+                return (value.shape, self._round_significant(value).tobytes())
+            return (value.dtype.str, value.shape, value.tobytes())
+        if isinstance(value, dict):
+            return tuple(sorted((k, self.quantize(v)) for k, v in value.items()))
+        return value
+
+    def _round_significant(self, value):
+        """Round an array to self.digits significant digits, elementwise and vectorised."""
+        x = np.asarray(value, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            magnitude = np.floor(np.log10(np.abs(x)))
+            scale = 10.0 ** (self.digits - 1 - np.where(np.isfinite(magnitude), magnitude, 0))
+            rounded = np.round(x * scale) / scale
+        # zeros, infinities and nan keep their value; -0.0 keys like 0.0
+        return np.where(np.isfinite(rounded), rounded, x) + 0.0
+
+    @classmethod
+    def sizeof(cls, value):
+        """Rough size in bytes of a cached result."""
+        if isinstance(value, np.ndarray):
+            return value.nbytes + 112
+        if isinstance(value, dict):
+            return sys.getsizeof(value) + sum(cls.sizeof(v) for v in value.values())
+        return sys.getsizeof(value)
+
+    def _bind(self, name, args, kwargs):
+        signature = self._signatures.get(name)
+        if signature is None:
+            signature = self._signatures[name] = inspect.signature(getattr(self.strategy, name))
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return bound.arguments
+
+    @staticmethod
+    def _copy(value):
+        """Shallow copy of dict results, so callers cannot rebind keys of a cached entry."""
+        return dict(value) if isinstance(value, dict) else value
+
+    def _freeze(self, value):
+        """Make cached arrays read-only so callers cannot corrupt an entry."""
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        elif isinstance(value, dict):
+            for v in value.values():
+                self._freeze(v)
+        return value
+
+
+if __name__ == '__main__':
+    import time
+    from EuroStrats import BlackScholesPricing
+    from EuroVanillaOpt import EuroVanillaOpt
+    cached = CachedPricing(BlackScholesPricing())
+    call = EuroVanillaOpt(100, 100, 1, 0.05, 0.3, "call", cached)
+    print(call.price(), call.greeks(), cached.stats())
+
+    spots = np.linspace(80, 120, 41)
+    start = time.perf_counter()
+    for _ in range(50):
+        for S0 in spots:
+            cached.calculate_price(S0, 100, 1, 0.05, 0.3, "call")
+            cached.greeks(S0, 100, 1, 0.05, 0.3, "call")
+    print(time.perf_counter() - start, cached.stats())
+    print(cached.invalidate(S0=100.0), cached.stats())
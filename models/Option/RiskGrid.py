@@ -0,0 +1,123 @@
+import inspect
+import numpy as np
+
+
+class RiskGrid:
+    """Spot/vol scenario grid revaluation of a portfolio of options.
+
+    Positions are (contract, quantity) pairs, where a contract is any of
+    EuroVanillaOpt, AmericanCall or AsianCall (anything with S0, K, T, r,
+    sigma, pricing_strats and optionally otype). Every position is revalued
+    at S0 * (1 + spot_shock) and sigma + vol_shock (or sigma * (1 + vol_shock)
+    with relative_vol=True) for every pair of shocks.
+
+    Positions are grouped by pricing path. Strategies with calculate_chain
+    (Black-Scholes) value the whole group on the grid in one broadcast call.
+    Strategies with calculate_tree (binomial, European or American) value
+    all grid points of the group as one chain of trees with tree_steps
+    steps, in row blocks bounded by max_memory. Anything else (Monte Carlo
+    exotics, finite differences) is called once per grid point; Monte Carlo
+    strategies get a fixed seed, so that every scenario sees the same paths.
+    """
+    def __init__(self, spot_shocks, vol_shocks, relative_vol=False, tree_steps=200, mc_kwargs=None,
+                 max_memory=2 ** 27):
+        self.spot_shocks = np.asarray(spot_shocks, dtype=np.float64)
+        self.vol_shocks = np.asarray(vol_shocks, dtype=np.float64)
+        self.relative_vol = relative_vol
+        self.tree_steps = tree_steps
+        self.mc_kwargs = {"seed": 0, **(mc_kwargs or {})}
+        self.max_memory = max_memory
+
+    def revalue(self, positions):
+        """Revalue positions on the grid.
+
+        Returns a dict with base (P,) values at the unshocked inputs, values
+        (P, N, M) on the grid, and pnl (P, N, M), quantity times the change
+        in value, with N spot shocks and M vol shocks.
+        """
+        base = self._value(positions, np.zeros(1), np.zeros(1))[:, 0, 0]
+        values = self._value(positions, self.spot_shocks, self.vol_shocks)
+        quantity = np.array([q for _, q in positions], dtype=np.float64)
+        pnl = quantity[:, None, None] * (values - base[:, None, None])
+        return {"base": base, "values": values, "pnl": pnl,
+                "spot_shocks": self.spot_shocks, "vol_shocks": self.vol_shocks}
+
+    def summary(self, result, level=0.99):
+        """Portfolio P&L grid, worst scenario loss and the loss quantile across scenarios."""
+        portfolio = result["pnl"].sum(axis=0)
+        worst = np.unravel_index(np.argmin(portfolio), portfolio.shape)
+        return {"portfolio_pnl": portfolio,
+                "worst_loss": -portfolio[worst],
+                "worst_scenario": (self.spot_shocks[worst[0]], self.vol_shocks[worst[1]]),
+                "scenario_var": -np.quantile(portfolio, 1 - level)}
+
+    def _value(self, positions, spot_shocks, vol_shocks):
+        values = np.empty((len(positions), len(spot_shocks), len(vol_shocks)))
+        groups = {}
+        for i, (contract, _) in enumerate(positions):
+            groups.setdefault(id(contract.pricing_strats), []).append(i)
+        for index in groups.values():
+            contracts = [positions[i][0] for i in index]
+            strategy = contracts[0].pricing_strats
+            S0, K, T, r, sigma = (np.array([getattr(c, name) for c in contracts], dtype=np.float64)[:, None, None]
+                                  for name in ("S0", "K", "T", "r", "sigma"))
+            otype = np.array([getattr(c, "otype", "call") for c in contracts])[:, None, None]
+            S = S0 * (1 + spot_shocks[None, :, None])
+            vol = sigma * (1 + vol_shocks[None, None, :]) if self.relative_vol else sigma + vol_shocks[None, None, :]
+            S, K, T, r, vol, otype = np.broadcast_arrays(S, K, T, r, vol, otype)
+            if hasattr(strategy, "calculate_chain"):
+                values[index] = strategy.calculate_chain(S, K, T, r, vol, otype)["price"]
+            elif hasattr(strategy, "calculate_tree"):
+                values[index] = self._tree_values(strategy, S, K, T, r, vol, otype)
+            else:
+                values[index] = self._mc_values(strategy, contracts, S, K, T, r, vol, otype)
+        return values
+
+    def _tree_values(self, strategy, *inputs):
+        """Value every grid point as one chain of trees, in row blocks that fit max_memory."""
+        flat = [x.ravel() for x in inputs]
+        out = np.empty(flat[0].shape)
+        rows = int(max(1, self.max_memory // (8 * 4 * (self.tree_steps + 1))))
+        for start in range(0, len(out), rows):
+            S, K, T, r, vol, otype = (x[start:start + rows] for x in flat)
+            tree = strategy.calculate_tree(S, K, T, r, vol, otype=otype, m=self.tree_steps)
+            out[start:start + rows] = tree["price"] if isinstance(tree, dict) else tree
+        return out.reshape(inputs[0].shape)
+
+    def _mc_values(self, strategy, contracts, S, K, T, r, vol, otype):
+        """One valuation per grid point; mc_kwargs are passed where the strategy accepts them."""
+        out = np.empty(S.shape)
+        parameters = inspect.signature(strategy.calculate_price).parameters
+        for i, contract in enumerate(contracts):
+            kwargs = {name: value for name, value in self.mc_kwargs.items() if name in parameters}
+            if hasattr(contract, "otype"):
+                kwargs["otype"] = contract.otype
+            for j, k in np.ndindex(S.shape[1:]):
+                out[i, j, k] = strategy.calculate_price(S[i, j, k], K[i, j, k], T[i, j, k], r[i, j, k],
+                                                        vol[i, j, k], **kwargs)
+        return out
+
+
+if __name__ == '__main__':
+    import time
+    from EuroStrats import BlackScholesPricing
+    from EuroVanillaOpt import EuroVanillaOpt
+    from AmericanStrats import BinomialPricing
+    from AmericanCall import AmericanCall
+    from AsianStrats import MonteCarloPricing
+    from AsianCall import AsianCall
+
+    rng = np.random.default_rng(0)
+    bsm, tree, mc = BlackScholesPricing(), BinomialPricing(), MonteCarloPricing()
+    positions = [(EuroVanillaOpt(100, K, T, 0.03, s, o, bsm), q) for K, T, s, o, q in zip(
+        rng.uniform(80, 120, 5000), rng.uniform(0.1, 2, 5000), rng.uniform(0.1, 0.5, 5000),
+        np.where(rng.random(5000) < 0.5, "call", "put"), rng.integers(-10, 11, 5000))]
+    positions += [(AmericanCall(100, K, 1, 0.03, 0.25, tree), 5) for K in rng.uniform(90, 110, 200)]
+    positions += [(AsianCall(100, 100, 1, 0.03, 0.25, mc), 10)]
+
+    grid = RiskGrid(np.linspace(-0.2, 0.2, 11), np.linspace(-0.1, 0.1, 5), mc_kwargs={"n": 2000, "m": 50})
+    start = time.perf_counter()
+    result = grid.revalue(positions)
+    print(f"{len(positions)} positions x {result['pnl'][0].size} scenarios in {time.perf_counter() - start:.2f} s")
+    report = grid.summary(result)
+    print(report["worst_loss"], report["worst_scenario"], report["scenario_var"])
@@ -1,5 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
+from PathGenerator import GBMPathGenerator
 
 
 class Simulation:
@@ -7,16 +8,11 @@ class Simulation:
     def __init__(self):
         pass
 
-    def draw_paths(self, S0, T, r, sigma, m, n):
-        dt = T / m
-        S = np.zeros(m + 1)
+    def draw_paths(self, S0, T, r, sigma, m, n, method="pcg64", seed=None):
         x = np.linspace(0, T, m + 1)
-        
-        for i in range(n):
-            S[0] = S0
-            for j in range(0, m):
-                S[j+1] = S[j] * np.exp((r - 0.5 * sigma ** 2)) * dt + sigma * np.sqrt(dt) * np.random.randn()
-            plt.plot(x, S)
+        generator = GBMPathGenerator(S0, T, r, sigma, m, method=method, seed=seed)
+        for S in generator.path_blocks(n):
+            plt.plot(x, S.T)
 
         plt.title("Simulation of underlying asset price")
         plt.xlabel("Steps of time")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   benchmark.py
+@Time    :   2023/06/20 21:12:40
+@Author  :   Clay
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import numpy as np
+
+from order import LimitOrder, MarketOrder
+from orderbook import OrderBook
+from price_history import PriceHistoryDB
+from matching_engine import MatchingEngine
+
+# 订单流中的操作编码
+PASSIVE, AGGRESSIVE_LIMIT, MARKET, CANCEL = 0, 1, 2, 3
+
+# 各场景中 (被动限价, 主动限价, 市价, 撤单) 的比例，以及预先挂入的每侧价位数
+SCENARIOS = {
+    "passive_heavy": {"mix": (0.85, 0.05, 0.05, 0.05), "levels": 1000},
+    "aggressive_heavy": {"mix": (0.30, 0.35, 0.35, 0.00), "levels": 1000},
+    "cancel_heavy": {"mix": (0.45, 0.02, 0.03, 0.50), "levels": 1000},
+    "deep_book": {"mix": (0.50, 0.20, 0.20, 0.10), "levels": 100000},
+}
+
+
+def build_book(levels:int, orders_per_level:int=1, mid_price:float=2230, tick:float=0.01, seed:int=0):
+    """
+    在中间价两侧各生成 levels 个价位的订单簿。
+    """
+    rng = np.random.default_rng(seed)
+    book = OrderBook()
+    for side, sign in (('Buy', -1), ('Sell', 1)):
+        prices = np.round(mid_price + sign * tick * np.repeat(np.arange(1, levels + 1), orders_per_level), 2)
+        sizes = rng.integers(low=100, high=1000, size=len(prices))
+        book.insert_orders([LimitOrder(side, size, price) for price, size in zip(prices.tolist(), sizes.tolist())],
+                           bid_side=side == 'Buy')
+    return book
+
+
+def generate_flow(order_count:int, mix, mid_price:float=2230, tick:float=0.01, seed:int=0):
+    """
+    可复现的合成订单流，按列返回操作、方向(1 为买)、价格、数量和撤单随机数。
+    """
+    rng = np.random.default_rng(seed)
+    actions = rng.choice(4, size=order_count, p=mix)
+    is_buy = rng.random(order_count) < 0.5
+    offsets = np.round(np.abs(rng.normal(0, 20, order_count)) + 1) * tick
+    sign = np.where(is_buy, -1, 1)
+    # 被动单挂在己方，主动限价单越过中间价
+    prices = np.where(actions == AGGRESSIVE_LIMIT, mid_price - sign * offsets, mid_price + sign * offsets)
+    return {
+        "action": actions,
+        "is_buy": is_buy,
+        "price": np.round(prices, 2),
+        "size": rng.integers(low=100, high=1000, size=order_count),
+        "cancel_pick": rng.random(order_count),
+    }
+
+
+def run_flow(engine:MatchingEngine, flow:dict, latencies:np.ndarray=None):
+    """
+    把订单流送入撮合引擎，可选地记录每个订单的耗时(纳秒)。
+    返回各类操作的累计耗时和次数。
+    """
+    book = engine.orderbook
+    resting = list(book.bid_side) + list(book.ask_side)
+    elapsed = {"insert": 0, "match": 0, "cancel": 0}
+    counts = {"insert": 0, "match": 0, "cancel": 0}
+    clock = time.perf_counter_ns
+
+    for i, (action, is_buy, price, size, pick) in enumerate(zip(
+            flow["action"].tolist(), flow["is_buy"].tolist(), flow["price"].tolist(),
+            flow["size"].tolist(), flow["cancel_pick"].tolist())):
+        direction = 'Buy' if is_buy else 'Sell'
+        if action == CANCEL:
+            kind = "cancel"
+            start = clock()
+            while resting:
+                # 随机挑一个挂单撤掉，已成交的订单号直接丢弃
+                index = int(pick * len(resting))
+                resting[index], resting[-1] = resting[-1], resting[index]
+                order_id = resting.pop()
+                if order_id in book.bid_side or order_id in book.ask_side:
+                    book.pop_order(order_id)
+                    break
+        elif action == MARKET:
+            kind = "match"
+            order = MarketOrder(direction, size, book.get_security())
+            start = clock()
+            engine.route_order(order)
+        else:
+            kind = "insert" if action == PASSIVE else "match"
+            order = LimitOrder(direction, size, price, book.get_security())
+            start = clock()
+            engine.route_order(order)
+            resting.append(order.get_order_id())
+        cost = clock() - start
+        elapsed[kind] += cost
+        counts[kind] += 1
+        if latencies is not None:
+            latencies[i] = cost
+    return elapsed, counts
+
+
+def bench_orderbook(order_count:int, seed:int=0):
+    """
+    只测订单簿本身：挂单和撤单的吞吐量。
+    """
+    flow = generate_flow(order_count, (1.0, 0.0, 0.0, 0.0), seed=seed)
+    orders = [LimitOrder('Buy' if is_buy else 'Sell', size, price)
+              for is_buy, price, size in zip(flow["is_buy"].tolist(), flow["price"].tolist(), flow["size"].tolist())]
+    book = OrderBook()
+    start = time.perf_counter()
+    for order in orders:
+        book.insert_order(order)
+    insert_time = time.perf_counter() - start
+    order_ids = [order.get_order_id() for order in orders]
+    np.random.default_rng(seed).shuffle(order_ids)
+    start = time.perf_counter()
+    for order_id in order_ids:
+        book.pop_order(order_id)
+    cancel_time = time.perf_counter() - start
+    return {"inserts_per_s": order_count / insert_time, "cancels_per_s": order_count / cancel_time}
+
+
+def bench_scenario(name:str, order_count:int, seed:int=0):
+    """
+    一个场景跑两遍：第一遍测吞吐量和逐单延迟，第二遍在 tracemalloc 下测峰值内存。
+    """
+    scenario = SCENARIOS[name]
+    flow = generate_flow(order_count, scenario["mix"], seed=seed)
+
+    engine = MatchingEngine(build_book(scenario["levels"], seed=seed), PriceHistoryDB())
+    latencies = np.empty(order_count, dtype=np.int64)
+    start = time.perf_counter()
+    elapsed, counts = run_flow(engine, flow, latencies)
+    wall_time = time.perf_counter() - start
+
+    tracemalloc.start()
+    engine = MatchingEngine(build_book(scenario["levels"], seed=seed), PriceHistoryDB())
+    run_flow(engine, flow)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    rate = lambda kind: counts[kind] / (elapsed[kind] / 1e9) if counts[kind] else None
+    return {
+        "orders": order_count,
+        "orders_per_s": order_count / wall_time,
+        "inserts_per_s": rate("insert"),
+        "matches_per_s": rate("match"),
+        "cancels_per_s": rate("cancel"),
+        "latency_p50_us": float(np.percentile(latencies, 50)) / 1e3,
+        "latency_p99_us": float(np.percentile(latencies, 99)) / 1e3,
+        "peak_memory_mb": peak_memory / 2**20,
+        "trades": engine.price_history.get_trade_count(),
+    }
+
+
+def bench_sweep(levels:int=10000, seed:int=0):
+    """
+    单笔市价单扫过整侧订单簿所需时间(秒)。
+    """
+    book = build_book(levels, seed=seed)
+    engine = MatchingEngine(book, PriceHistoryDB(book.get_security()))
+    order = MarketOrder('Buy', int(book.get_aggregate_size(bid_side=False)), book.get_security())
+    start = time.perf_counter()
+    engine.match_buy_market_order(order)
+    return time.perf_counter() - start
+
+
+def get_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='order_engine throughput and latency benchmark')
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    results = {
+        "version": get_version(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": args.seed,
+        "orderbook": bench_orderbook(args.orders, args.seed),
+        "sweep_10000_levels_s": bench_sweep(10000, args.seed),
+        "scenarios": {name: bench_scenario(name, args.orders, args.seed) for name in args.scenarios},
+    }
+
+    print(f"orderbook: {results['orderbook']['inserts_per_s']:,.0f} inserts/s, "
+          f"{results['orderbook']['cancels_per_s']:,.0f} cancels/s")
+    print(f"sweep 10000 levels: {results['sweep_10000_levels_s']:.4f} s")
+    for name, result in results["scenarios"].items():
+        print(f"{name:>16}: {result['orders_per_s']:>10,.0f} orders/s  "
+              f"p50 {result['latency_p50_us']:8.1f} us  p99 {result['latency_p99_us']:8.1f} us  "
+              f"peak {result['peak_memory_mb']:7.1f} MB")
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
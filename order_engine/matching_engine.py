@@ -6,11 +6,13 @@
 @Contact :   claysomes@outlook.com
 '''
 
-import pandas as pd
-import datetime as dt
+import time
+from collections import deque
+
+import numpy as np
 
 from orderbook import OrderBook
-from order import MarketOrder, LimitOrder
+from order import MarketOrder, LimitOrder, IcebergOrder
 from price_history import PriceHistoryDB
 
 
@@ -18,174 +20,320 @@ class MatchingEngine:
     def __init__(self, orderbook:OrderBook, price_history:PriceHistoryDB):
         self.orderbook = orderbook
         self.price_history = price_history
-        self.fifo_buffer = []
+        # 待处理的订单队列，由 dispatch 分批取出
+        self.fifo_buffer = deque()
+        # 冰山订单：峰值订单号 -> IcebergOrder
+        self.icebergs = {}
+        # 集合竞价模式下，dispatch 把取出的一批订单作为一次竞价撮合
+        self.auction_mode = False
 
     def add_to_buffer(self, order):
         self.fifo_buffer.append(order)
 
     def remove_from_buffer(self):
-        self.fifo_buffer.pop(index=0)
+        return self.fifo_buffer.popleft()
+
+    def set_auction_mode(self, auction_mode:bool):
+        self.auction_mode = auction_mode
+
+    def dispatch(self, batch_size:int=None):
+        """
+        从队列取出最多 batch_size 个订单(默认全部)。
+        连续撮合模式下逐个路由；集合竞价模式下整批做一次竞价。
+        返回处理的订单数。
+        """
+        count = len(self.fifo_buffer) if batch_size is None else min(batch_size, len(self.fifo_buffer))
+        orders = [self.fifo_buffer.popleft() for _ in range(count)]
+        if self.auction_mode:
+            self.call_auction(orders)
+        else:
+            for order in orders:
+                self.route_order(order)
+        return count
 
     def get_best_buy_order(self):
-        sorted_bid_side = self.orderbook.sort_price_time(bid_side=True)
-        best_buy_order_id = sorted_bid_side.iloc[0, 'Order ID']
-        return self.orderbook[best_buy_order_id]
+        return self.orderbook.get_best_order(bid_side=True)
     
     def get_best_sell_order(self):
-        sorted_ask_side = self.orderbook.sort_price_time(bid_side=False)
-        best_sell_order_id = sorted_ask_side.iloc[0, 'Order ID']
-        return self.orderbook[best_sell_order_id]
+        return self.orderbook.get_best_order(bid_side=False)
     
-    def match_sell_market_order(self, sell_market_order:MarketOrder):
+    def match_order(self, order, bid_side:bool, price_limit:float=None):
         """
-        与卖出市价订单匹配。
+        按价格-时间优先顺序原地遍历对手方价位进行撮合。
+        同一笔主动订单产生的成交记录先在本地累积，最后一次性写入成交历史。
+        返回未成交的剩余数量。
         """
-        remaining_size = sell_market_order.get_size()
-        sorted_bid_side = self.orderbook.sort_price_time(bid_side=True)
-        order_counter = 0
+        remaining_size = order.get_size()
+        order_id = order.get_order_id()
+        levels = self.orderbook.bid_levels if bid_side else self.orderbook.ask_levels
+        trades = []
+        execution_time = None
 
         while remaining_size > 0:
-            buy_order_size = sorted_bid_side['Size'].iloc[order_counter]
-            buy_order_id = sorted_bid_side.iloc[order_counter].name
-
-            if remaining_size == buy_order_size:
-                remaining_size -= buy_order_size
-                matched_buy_order = self.orderbook.pop_order(buy_order_id)
-                trade_data = [matched_buy_order.get_price_limit(), dt.datetime.now(),
-                              [buy_order_id, sell_market_order.get_order_id()], buy_order_size]
-                self.price_history.insert_trade(trade_data)
-            elif remaining_size > buy_order_size:
-                remaining_size -= buy_order_size
-                matched_buy_order = self.orderbook.pop_order(buy_order_id)
-                trade_data = [matched_buy_order.get_price_limit(), dt.datetime.now(),
-                              [buy_order_id, sell_market_order.get_order_id()], buy_order_size]
-                self.price_history.insert_trade(trade_data)
-                order_counter += 1
-            else:
-                updated_size = buy_order_size - remaining_size
-                self.orderbook.bid_side[buy_order_id].update_size(updated_size)
-                remaining_size = 0
+            level = levels.best_level()
+            if level is None:
+                break
+            if price_limit is not None and (price_limit > level.price if bid_side else price_limit < level.price):
+                break
+            if execution_time is None:
+                execution_time = time.time_ns()
+
+            while remaining_size > 0 and level.orders:
+                resting_order = level.head()
+                resting_id = resting_order.get_order_id()
+                resting_size = resting_order.get_size()
+
+                if remaining_size >= resting_size:
+                    remaining_size -= resting_size
+                    trades.append([level.price, execution_time, [resting_id, order_id], resting_size])
+                    if resting_order.get_is_iceberg_peak():
+                        self.replenish_iceberg(self.icebergs[resting_id], resting_size)
+                    else:
+                        self.orderbook.pop_order(resting_id)
+                else:
+                    level.update_order_size(resting_id, resting_size - remaining_size)
+                    trades.append([level.price, execution_time, [resting_id, order_id], remaining_size])
+                    if resting_order.get_is_iceberg_peak():
+                        iceberg = self.icebergs[resting_id]
+                        iceberg.update_iceberg_order_size(iceberg.get_size() - remaining_size)
+                    remaining_size = 0
+
+        if trades:
+            self.price_history.insert_trades(trades)
+        return remaining_size
+
+    def match_sell_market_order(self, sell_market_order:MarketOrder):
+        """
+        与卖出市价订单匹配。
+        """
+        return self.match_order(sell_market_order, bid_side=True)
     
     def match_buy_market_order(self, buy_market_order:MarketOrder):
         """
         与买入市价订单匹配
         """
-        remaining_size = buy_market_order.get_size()
-        sorted_ask_side = self.orderbook.sort_price_time(bid_side=False)
-        order_counter = 0
-
-        while remaining_size > 0:
-            sell_order_size = sorted_ask_side['Size'].iloc[order_counter]
-            sell_order_id = sorted_ask_side.iloc[order_counter].name
-
-            if remaining_size == sell_order_size:
-                remaining_size -= sell_order_size
-                matched_sell_order = self.orderbook.pop_order(sell_order_id)
-                trade_data = [matched_sell_order.get_price_limit(), dt.datetime.now(),
-                              [sell_order_id, buy_market_order.get_order_id()], sell_order_size]
-                self.price_history.insert_trade(trade_data)
-            elif remaining_size > sell_order_size:
-                remaining_size -= sell_order_size
-                matched_sell_order = self.orderbook.pop_order(sell_order_id)
-                trade_data = [matched_sell_order.get_price_limit(), dt.datetime.now(),
-                              [sell_order_id, buy_market_order.get_order_id()], sell_order_size]
-                self.price_history.insert_trade(trade_data)
-                order_counter += 1
-            else:
-                updated_size = sell_order_size - remaining_size
-                self.orderbook.ask_side[sell_order_id].update_size(updated_size)
-                remaining_size = 0
+        return self.match_order(buy_market_order, bid_side=False)
 
     def match_sell_limit_order(self, sell_limit_order:LimitOrder):
         """
         与卖出限价订单匹配
         """
-        remaining_size = sell_limit_order.get_size()
-        sorted_bid_side = self.orderbook.sort_price_time(bid_side=True)
-        order_counter = 0
-        ask_price_limit = sell_limit_order.get_price_limit()
-        bid_price_limit = sorted_bid_side['Price_limit'].iloc[order_counter]
-
-        while remaining_size > 0 and ask_price_limit <= bid_price_limit:
-            buy_order_size = sorted_bid_side['Size'].iloc[order_counter]
-            buy_order_id = sorted_bid_side.iloc[order_counter].name
-
-            if remaining_size == buy_order_size:
-                remaining_size -= buy_order_size
-                matched_buy_order = self.orderbook.pop_order(buy_order_id)
-                trade_data = [matched_buy_order.get_price_limit(), dt.datetime.now(),
-                              [buy_order_id, sell_limit_order.get_order_id()], buy_order_size]
-                self.price_history.insert_trade(trade_data)
-            elif remaining_size > buy_order_size:
-                remaining_size -= buy_order_size
-                matched_buy_order = self.orderbook.pop_order(buy_order_id)
-                trade_data = [matched_buy_order.get_price_limit(), dt.datetime.now(),
-                              [buy_order_id, sell_limit_order.get_order_id()], buy_order_size]
-                self.price_history.insert_trade(trade_data)
-                order_counter += 1
-                bid_price_limit = sorted_bid_side['Price_limit'].iloc[order_counter]
-            else:
-                updated_size = buy_order_size - remaining_size
-                self.orderbook.bid_side[buy_order_id].update_size(updated_size)
-                remaining_size = 0
-
+        remaining_size = self.match_order(sell_limit_order, bid_side=True,
+                                          price_limit=sell_limit_order.get_price_limit())
         if remaining_size > 0:
             sell_limit_order.update_size(remaining_size)
             self.orderbook.insert_order(sell_limit_order)
+        return remaining_size
 
     def match_buy_limit_order(self, buy_limit_order:LimitOrder):
         """
         与买入限价订单匹配
         """
-        remaining_size = buy_limit_order.get_size()
-        sorted_ask_side = self.orderbook.sort_price_time(bid_side=False)
-        order_counter = 0
-        bid_price_limit = buy_limit_order.get_price_limit()
-        ask_price_limit = sorted_ask_side['Price_limit'].iloc[order_counter]
-
-        while remaining_size > 0 and bid_price_limit >= ask_price_limit:
-            sell_order_size = sorted_ask_side['Size'].iloc[order_counter]
-            sell_order_id = sorted_ask_side.iloc[order_counter].name
-
-            if remaining_size == sell_order_size:
-                remaining_size -= sell_order_size
-                matched_sell_order = self.orderbook.pop_order(sell_order_id)
-                trade_data = [matched_sell_order.get_price_limit(), dt.datetime.now(),
-                              [sell_order_id, buy_limit_order.get_order_id()], sell_order_size]
-                self.price_history.insert_trade(trade_data)
-            elif remaining_size > sell_order_size:
-                remaining_size -= sell_order_size
-                matched_sell_order = self.orderbook.pop_order(sell_order_id)
-                trade_data = [matched_sell_order.get_price_limit(), dt.datetime.now(),
-                              [sell_order_id, buy_limit_order.get_order_id()], sell_order_size]
-                self.price_history.insert_trade(trade_data)
-                order_counter += 1
-                ask_price_limit = sorted_ask_side['Price_limit'].iloc[order_counter]
-            else:
-                updated_size = sell_order_size - remaining_size
-                self.orderbook.ask_side[sell_order_id].update_size(updated_size)
-                remaining_size = 0
-        
+        remaining_size = self.match_order(buy_limit_order, bid_side=False,
+                                          price_limit=buy_limit_order.get_price_limit())
         if remaining_size > 0:
-            buy_limit_order.update(remaining_size)
+            buy_limit_order.update_size(remaining_size)
             self.orderbook.insert_order(buy_limit_order)
+        return remaining_size
+
+    def match_iceberg_order(self, iceberg_order:IcebergOrder):
+        """
+        冰山订单先按限价以全部数量撮合，剩余部分以峰值订单挂入订单簿，
+        其余数量隐藏，峰值成交完后再补充。
+        """
+        bid_side = iceberg_order.get_direction() == 'Sell'
+        remaining_size = self.match_order(iceberg_order, bid_side=bid_side,
+                                          price_limit=iceberg_order.get_price_limit())
+        iceberg_order.update_iceberg_order_size(remaining_size)
+        if remaining_size > 0:
+            peak_order = iceberg_order.get_peak_order()
+            iceberg_order.update_peak_order_size(min(iceberg_order.get_peak_size(), remaining_size))
+            self.icebergs[peak_order.get_order_id()] = iceberg_order
+            self.orderbook.insert_order(peak_order)
+        return remaining_size
+
+    def replenish_iceberg(self, iceberg_order:IcebergOrder, filled_size:int):
+        """
+        峰值订单完全成交：从隐藏数量中补充峰值，并排到所在价位的队尾(失去时间优先)。
+        峰值订单对象和价位都原地复用，补充是 O(1) 的。
+        """
+        peak_order_id = iceberg_order.get_peak_order().get_order_id()
+        hidden_size = iceberg_order.get_size() - filled_size
+        iceberg_order.update_iceberg_order_size(hidden_size)
+        if hidden_size > 0:
+            iceberg_order.update_peak_order_arrival_time()
+            self.orderbook.requeue_order(peak_order_id, min(iceberg_order.get_peak_size(), hidden_size))
+        else:
+            del self.icebergs[peak_order_id]
+            self.orderbook.pop_order(peak_order_id)
+
+    def cancel_iceberg_order(self, iceberg_order:IcebergOrder):
+        peak_order_id = iceberg_order.get_peak_order().get_order_id()
+        if self.icebergs.pop(peak_order_id, None) is not None:
+            self.orderbook.pop_order(peak_order_id)
+        iceberg_order.update_status('Cancelled')
+
+    def get_uncrossing_price(self, market_buy_size:int=0, market_sell_size:int=0):
+        """
+        用累计需求/供给曲线计算集合竞价的成交价。
+        候选价格为订单簿中所有价位，需求为限价不低于该价的买单加市价买单，
+        供给为限价不高于该价的卖单加市价卖单。
+        冰山订单按全部数量(峰值加隐藏数量)计入曲线。
+        取成交量最大的价格，其次取买卖不平衡最小的价格，再取最接近参考价的价格。
+        返回 (成交价, 成交量)，无法成交时成交价为 None。
+        """
+        bid_prices, bid_sizes = self.orderbook.get_level_arrays(bid_side=True)
+        ask_prices, ask_sizes = self.orderbook.get_level_arrays(bid_side=False)
+        hidden = {True: {}, False: {}}
+        for iceberg in self.icebergs.values():
+            side = hidden[iceberg.get_direction() == 'Buy']
+            price = iceberg.get_price_limit()
+            side[price] = side.get(price, 0) + iceberg.get_size() - iceberg.get_peak_order().get_size()
+        if hidden[True]:
+            bid_sizes = bid_sizes + np.array([hidden[True].get(price, 0) for price in bid_prices], dtype=bid_sizes.dtype)
+        if hidden[False]:
+            ask_sizes = ask_sizes + np.array([hidden[False].get(price, 0) for price in ask_prices], dtype=ask_sizes.dtype)
+        bid_prices, bid_sizes = bid_prices[::-1], bid_sizes[::-1]
+        candidates = np.union1d(bid_prices, ask_prices)
+        if len(candidates) == 0:
+            return None, 0
+
+        bid_cumsum = np.concatenate(([0], np.cumsum(bid_sizes)))
+        ask_cumsum = np.concatenate(([0], np.cumsum(ask_sizes)))
+        demand = market_buy_size + bid_cumsum[-1] - bid_cumsum[np.searchsorted(bid_prices, candidates, side='left')]
+        supply = market_sell_size + ask_cumsum[np.searchsorted(ask_prices, candidates, side='right')]
+        volume = np.minimum(demand, supply)
+        max_volume = volume.max()
+        if max_volume == 0:
+            return None, 0
+
+        imbalance = np.abs(demand - supply)
+        best = volume == max_volume
+        best &= imbalance == imbalance[best].min()
+        prices = candidates[best]
+        if self.price_history.get_trade_count():
+            reference_price = self.price_history.get_last_traded_price()
+        else:
+            reference_price = prices.mean()
+        return float(prices[np.argmin(np.abs(prices - reference_price))]), int(max_volume)
+
+    def _auction_queue(self, market_orders, bid_side:bool, uncrossing_price:float):
+        """
+        参与竞价的一方：市价单优先，其后为能在成交价成交的限价单(价格-时间优先)。
+        """
+        queue = list(market_orders)
+        for level in self.orderbook.iter_levels(bid_side):
+            if level.price < uncrossing_price if bid_side else level.price > uncrossing_price:
+                break
+            queue.extend(level)
+        return queue
+
+    def _auction_size(self, order):
+        """
+        竞价中订单可成交的数量：冰山订单的峰值代表整笔冰山订单(含隐藏数量)。
+        """
+        iceberg = self.icebergs.get(order.get_order_id())
+        return order.get_size() if iceberg is None else iceberg.get_size()
+
+    def call_auction(self, orders):
+        """
+        集合竞价：限价单(和冰山订单的峰值)先不撮合直接挂入订单簿，
+        再按统一成交价一次性撮合，冰山订单以全部数量参与。未成交的市价单被撤销。
+        竞价成交记录中 Resting_order_id 为买单，Aggressive_order_id 为卖单。
+        返回成交价，无成交时为 None。
+        """
+        market_buys, market_sells = [], []
+        for order in orders:
+            order_type = order.get_order_type()
+            if order_type == 'Market':
+                (market_buys if order.get_direction() == 'Buy' else market_sells).append(order)
+            elif order_type == 'Iceberg':
+                peak_order = order.get_peak_order()
+                order.update_peak_order_size(min(order.get_peak_size(), order.get_size()))
+                self.icebergs[peak_order.get_order_id()] = order
+                self.orderbook.insert_order(peak_order)
+            else:
+                self.orderbook.insert_order(order)
+
+        uncrossing_price, volume = self.get_uncrossing_price(
+            sum(order.get_size() for order in market_buys),
+            sum(order.get_size() for order in market_sells)
+        )
+        if uncrossing_price is not None:
+            buys = self._auction_queue(market_buys, True, uncrossing_price)
+            sells = self._auction_queue(market_sells, False, uncrossing_price)
+            filled = {}
+            trades = []
+            execution_time = time.time_ns()
+            i = j = 0
+            buy_left, sell_left = self._auction_size(buys[0]), self._auction_size(sells[0])
+            while volume > 0:
+                size = min(buy_left, sell_left, volume)
+                buy_id, sell_id = buys[i].get_order_id(), sells[j].get_order_id()
+                trades.append([uncrossing_price, execution_time, [buy_id, sell_id], size])
+                filled[buy_id] = filled.get(buy_id, 0) + size
+                filled[sell_id] = filled.get(sell_id, 0) + size
+                volume -= size
+                buy_left -= size
+                sell_left -= size
+                if buy_left == 0 and volume > 0:
+                    i += 1
+                    buy_left = self._auction_size(buys[i])
+                if sell_left == 0 and volume > 0:
+                    j += 1
+                    sell_left = self._auction_size(sells[j])
+            self.price_history.insert_trades(trades)
+
+            for order in buys[:i + 1] + sells[:j + 1]:
+                order_id = order.get_order_id()
+                if order.get_order_type() == 'Market':
+                    order.update_size(order.get_size() - filled[order_id])
+                elif order.get_is_iceberg_peak():
+                    self._settle_auction_iceberg(self.icebergs[order_id], filled[order_id])
+                elif order.get_size() > filled[order_id]:
+                    self.orderbook.update_order_size(order_id, order.get_size() - filled[order_id])
+                else:
+                    self.orderbook.pop_order(order_id)
+
+        for order in market_buys + market_sells:
+            if order.get_size() > 0:
+                order.update_status('Cancelled')
+        return uncrossing_price
+
+    def _settle_auction_iceberg(self, iceberg_order:IcebergOrder, filled_size:int):
+        """
+        竞价成交后更新冰山订单：只成交了部分峰值时峰值原地减少；
+        峰值被吃完(可能连同部分隐藏数量)时从剩余数量补充峰值并排到队尾。
+        """
+        peak_order = iceberg_order.get_peak_order()
+        peak_size = peak_order.get_size()
+        if filled_size < peak_size:
+            iceberg_order.update_iceberg_order_size(iceberg_order.get_size() - filled_size)
+            self.orderbook.update_order_size(peak_order.get_order_id(), peak_size - filled_size)
+        else:
+            self.replenish_iceberg(iceberg_order, filled_size)
 
     def route_order(self, order):
         order_type = order.get_order_type()
         direction = order.get_direction()
         if order_type == 'Market':
-            self.add_to_buffer(order)
+            if direction == 'Sell':
+                self.match_sell_market_order(order)
+            else:
+                self.match_buy_market_order(order)
+        elif order_type == 'Iceberg':
+            self.match_iceberg_order(order)
         else:
             price_limit = order.get_price_limit()
-            best_buy_price = self.get_best_buy_order().get_price_limit()
-            best_sell_price = self.get_best_sell_order().get_price_limit()
+            best_buy_price = self.orderbook.get_best_price(bid_side=True)
+            best_sell_price = self.orderbook.get_best_price(bid_side=False)
             if direction == 'Sell':
-                if price_limit > best_buy_price:
+                if best_buy_price is None or price_limit > best_buy_price:
                     self.orderbook.insert_order(order)
                 else:
                     self.match_sell_limit_order(order)
             else:
-                if price_limit < best_sell_price:
+                if best_sell_price is None or price_limit < best_sell_price:
                     self.orderbook.insert_order(order)
                 else:
                     self.match_buy_limit_order(order)
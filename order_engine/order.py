@@ -6,28 +6,104 @@
 @Contact :   claysomes@outlook.com
 '''
 
+import time
+import threading
+import numpy as np
 import pandas as pd
-import datetime as dt
+from enum import IntEnum
+
+
+class Direction(IntEnum):
+    BUY = 0
+    SELL = 1
+
+    def __str__(self):
+        return self.name.capitalize()
+
+
+class OrderStatus(IntEnum):
+    PENDING = 0
+    PARTIALLY_FILLED = 1
+    FILLED = 2
+    CANCELLED = 3
+
+    def __str__(self):
+        return self.name.replace('_', ' ').capitalize()
+
+
+class OrderType(IntEnum):
+    MARKET = 0
+    LIMIT = 1
+    ICEBERG = 2
+
+    def __str__(self):
+        return self.name.capitalize()
+
+
+def to_code(enum, value):
+    """
+    把 'Buy'/'Partially filled' 之类的字符串或整数转换为枚举编码。
+    """
+    if isinstance(value, enum):
+        return value
+    if isinstance(value, str):
+        return enum[value.upper().replace(' ', '_')]
+    return enum(value)
+
+
+class OrderIdAllocator:
+    """
+    线程安全的订单号分配器，可以一次预留一段连续的订单号。
+    """
+
+    def __init__(self, start:int=1):
+        self._next = start
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            order_id = self._next
+            self._next += 1
+        return order_id
+
+    def reserve(self, count:int):
+        with self._lock:
+            start = self._next
+            self._next += count
+        return range(start, start + count)
+
+
+order_ids = OrderIdAllocator()
 
 
 class Order:
-    order_id = 0
+    """
+    订单基类。字段放在 __slots__ 中，方向和状态保存为枚举编码，
+    到达时间为整数纳秒。
+    """
+    __slots__ = ('order_id', 'direction', 'size', 'security', 'status', 'arrival_time', 'execution_price')
+    order_type = None
 
-    def __init__(self, direction:str, size:int, security:str):
-        Order.order_id += 1
-        self.order_id = Order.order_id
-        self.direction = direction
+    def __init__(self, direction:str, size:int, security:str, arrival_time:int=None, order_id:int=None):
+        self.order_id = order_ids.next() if order_id is None else order_id
+        self.direction = to_code(Direction, direction)
         self.size = size
         self.security = security
-        self.status = 'Pending'
-        self.arrival_time = dt.datetime.now()
+        self.status = OrderStatus.PENDING
+        self.arrival_time = time.time_ns() if arrival_time is None else arrival_time
         self.execution_price = None
 
+    def __str__(self):
+        return f'Order ID: {self.order_id}, Order Type: {self.order_type}, Direction: {self.direction}, Size: {self.size}, Security: {self.security}, Status: {self.status}, Arrival Time: {self.get_arrival_datetime()}'
+
     def get_order_id(self):
         return self.order_id
     
     def get_direction(self):
-        return self.direction
+        return str(self.direction)
+
+    def is_buy(self):
+        return self.direction == Direction.BUY
     
     def get_size(self):
         return self.size
@@ -36,13 +112,19 @@ class Order:
         return self.security
     
     def get_status(self):
-        return self.status
+        return str(self.status)
     
     def get_arrival_time(self):
         return self.arrival_time
+
+    def get_arrival_datetime(self):
+        return pd.Timestamp(self.arrival_time)
+
+    def get_order_type(self):
+        return str(self.order_type)
     
     def update_status(self, new_status:str):
-        self.status = new_status
+        self.status = to_code(OrderStatus, new_status)
 
     def update_execution_price(self, execution_price:float):
         self.execution_price = execution_price
@@ -52,74 +134,63 @@ class Order:
 
 
 class MarketOrder(Order):
+    __slots__ = ()
     attributes = ['Order ID', 'Order_type', 'Direction', 'Size', 'Security', 'Status', 'Arrival_time']
-
-    def __init__(self, direction:str, size:int, security:str):
-        super().__init__(direction, size, security)
-        self.order_type = 'Market'
-
-    def __str__(self) -> str:
-        return f'Order ID: {self.order_id}, Order Type: {self.order_type}, Direction: {self.direction}, Size: {self.size}, Security: {self.security}, Status: {self.status}, Arrival Time: {self.arrival_time}'
-    
-    def get_order_type(self):
-        return self.order_type
+    order_type = OrderType.MARKET
     
     def to_series(self):
         return pd.Series(
-            data = [self.get_order_id(), self.get_order_type(), self.get_direction(), self.get_size(), self.get_security(), self.get_status(), self.get_arrival_time()],
+            data = [self.get_order_id(), self.get_order_type(), self.get_direction(), self.get_size(), self.get_security(), self.get_status(), self.get_arrival_datetime()],
             index = MarketOrder.attributes,
             name = self.get_order_id()
         )
     
 
 class LimitOrder(Order):
+    __slots__ = ('price_limit', 'is_iceberg_peak')
     attributes = ['Order ID', 'Order_type', 'Direction', 'Size', 'Security', 'Price_limit', 'Status', 'Arrival_time', 'Is_iceberg_peak']
+    order_type = OrderType.LIMIT
 
-    def __init__(self, direction:str, size:int, price_limit:float, security:str="AMZN", is_iceberg_peak:bool=False):
-        super().__init__(direction, size, security)
-        self.order_type = 'Limit'
+    def __init__(self, direction:str, size:int, price_limit:float, security:str="AMZN", is_iceberg_peak:bool=False,
+                 arrival_time:int=None, order_id:int=None):
+        super().__init__(direction, size, security, arrival_time, order_id)
         self.price_limit = price_limit
         self.is_iceberg_peak = is_iceberg_peak
-
-    def __str__(self):
-        return f'Order ID: {self.order_id}, Order Type: {self.order_type}, Direction: {self.direction}, Size: {self.size}, Security: {self.security}, Status: {self.status}, Arrival Time: {self.arrival_time}'
     
     def get_price_limit(self):
         return self.price_limit
     
-    def get_order_type(self):
-        return self.order_type
-    
     def get_is_iceberg_peak(self):
         return self.is_iceberg_peak
     
     def to_series(self):
         return pd.Series(
-            data = [self.get_order_id(), self.get_order_type(), self.get_direction(), self.get_size(), self.get_security(), self.get_price_limit(), self.get_status(), self.get_arrival_time(), self.get_is_iceberg_peak()],
+            data = [self.get_order_id(), self.get_order_type(), self.get_direction(), self.get_size(), self.get_security(), self.get_price_limit(), self.get_status(), self.get_arrival_datetime(), self.get_is_iceberg_peak()],
             index = LimitOrder.attributes,
             name = self.get_order_id()
         )
     
 
 class IcebergOrder(Order):
+    __slots__ = ('peak_size', 'peak_order')
+    order_type = OrderType.ICEBERG
 
     def __init__(self, direction: str, iceberg_order_size:int, price_limit:float, security:str, peak_size:int):
         super().__init__(direction, iceberg_order_size, security)
-        self.order_type = "Iceberg"
         self.peak_size = peak_size
         self.peak_order = LimitOrder(direction=direction, size=peak_size, price_limit=price_limit, security=security, is_iceberg_peak=True)
 
-    def __str__(self):  
-        return f'Order ID: {self.order_id}, Order Type: {self.order_type}, Direction: {self.direction}, Size: {self.size}, Security: {self.security}, Status: {self.status}, Arrival Time: {self.arrival_time}'
-
     def get_peak_size(self):
         return self.peak_size
+
+    def get_price_limit(self):
+        return self.peak_order.get_price_limit()
     
     def get_peak_order(self):
         return self.peak_order
     
     def update_peak_order_arrival_time(self):
-        self.peak_order.arrival_time = dt.datetime.now()
+        self.peak_order.arrival_time = time.time_ns()
 
     def update_peak_order_size(self, updated_size:int):
         self.peak_order.update_size(updated_size)
@@ -128,8 +199,168 @@ class IcebergOrder(Order):
         self.update_size(updated_size)
 
 
+class OrderPool:
+    """
+    以列数组(struct-of-arrays)保存挂单的订单池，每个订单占用一个槽位。
+    撤单或成交后槽位进入空闲列表被复用，容量不足时翻倍。
+    订单簿里放的是 PooledOrder 视图，接口与 LimitOrder 相同。
+    """
+    dtype = np.dtype([
+        ('order_id', np.int64),
+        ('direction', np.int8),
+        ('status', np.int8),
+        ('is_iceberg_peak', np.bool_),
+        ('size', np.int64),
+        ('price_limit', np.float64),
+        ('arrival_time', np.int64),
+        ('execution_price', np.float64),
+    ])
+
+    def __init__(self, security:str="AMZN", capacity:int=1024):
+        self.security = security
+        self.columns = {name: np.zeros(capacity, dtype=self.dtype[name]) for name in self.dtype.names}
+        self.capacity = capacity
+        self.count = 0
+        self.free_slots = []
+
+    def __len__(self):
+        return self.count - len(self.free_slots)
+
+    def _reserve(self, extra:int):
+        required = self.count + extra
+        if required <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < required:
+            capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            self.columns[name] = grown
+        self.capacity = capacity
+
+    def add(self, direction:str, size:int, price_limit:float, arrival_time:int=None, is_iceberg_peak:bool=False):
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            self._reserve(1)
+            slot = self.count
+            self.count += 1
+        columns = self.columns
+        columns['order_id'][slot] = order_ids.next()
+        columns['direction'][slot] = to_code(Direction, direction)
+        columns['status'][slot] = OrderStatus.PENDING
+        columns['is_iceberg_peak'][slot] = is_iceberg_peak
+        columns['size'][slot] = size
+        columns['price_limit'][slot] = price_limit
+        columns['arrival_time'][slot] = time.time_ns() if arrival_time is None else arrival_time
+        columns['execution_price'][slot] = np.nan
+        return PooledOrder(self, slot)
+
+    def extend(self, direction:str, sizes, price_limits, arrival_times):
+        """
+        批量写入同方向的订单，一段连续的槽位和订单号一次分配。
+        """
+        n = len(sizes)
+        self._reserve(n)
+        start, end = self.count, self.count + n
+        columns = self.columns
+        columns['order_id'][start:end] = order_ids.reserve(n)
+        columns['direction'][start:end] = to_code(Direction, direction)
+        columns['status'][start:end] = OrderStatus.PENDING
+        columns['is_iceberg_peak'][start:end] = False
+        columns['size'][start:end] = sizes
+        columns['price_limit'][start:end] = price_limits
+        columns['arrival_time'][start:end] = arrival_times
+        columns['execution_price'][start:end] = np.nan
+        self.count = end
+        return [PooledOrder(self, slot) for slot in range(start, end)]
+
+    def release(self, slot:int):
+        self.free_slots.append(slot)
+
+
+class PooledOrder:
+    """
+    订单池中某个槽位的轻量视图。订单离开订单簿后槽位会被复用，
+    因此视图只在挂单期间有效。
+    """
+    __slots__ = ('pool', 'slot', 'order_id', 'price_limit')
+    attributes = LimitOrder.attributes
+    order_type = OrderType.LIMIT
+
+    def __init__(self, pool:OrderPool, slot:int):
+        self.pool = pool
+        self.slot = slot
+        # 订单号和价格在挂单期间不变，缓存在视图上以免反复读数组
+        self.order_id = int(pool.columns['order_id'][slot])
+        self.price_limit = float(pool.columns['price_limit'][slot])
+
+    def __str__(self):
+        return f'Order ID: {self.order_id}, Order Type: {self.order_type}, Direction: {self.get_direction()}, Size: {self.get_size()}, Security: {self.get_security()}, Status: {self.get_status()}, Arrival Time: {self.get_arrival_datetime()}'
+
+    def get_order_id(self):
+        return self.order_id
+
+    def get_direction(self):
+        return str(Direction(self.pool.columns['direction'][self.slot]))
+
+    def is_buy(self):
+        return self.pool.columns['direction'][self.slot] == Direction.BUY
+
+    def get_size(self):
+        return int(self.pool.columns['size'][self.slot])
+
+    def get_security(self):
+        return self.pool.security
+
+    def get_status(self):
+        return str(OrderStatus(self.pool.columns['status'][self.slot]))
+
+    def get_arrival_time(self):
+        return int(self.pool.columns['arrival_time'][self.slot])
+
+    def get_arrival_datetime(self):
+        return pd.Timestamp(self.get_arrival_time())
+
+    def get_order_type(self):
+        return str(self.order_type)
+
+    def get_price_limit(self):
+        return self.price_limit
+
+    def get_is_iceberg_peak(self):
+        return bool(self.pool.columns['is_iceberg_peak'][self.slot])
+
+    @property
+    def execution_price(self):
+        # 未成交时列中为 nan，对外与 Order 一致返回 None
+        price = self.pool.columns['execution_price'][self.slot]
+        return None if np.isnan(price) else float(price)
+
+    def update_status(self, new_status:str):
+        self.pool.columns['status'][self.slot] = to_code(OrderStatus, new_status)
+
+    def update_execution_price(self, execution_price:float):
+        self.pool.columns['execution_price'][self.slot] = execution_price
+
+    def update_size(self, update_size:int):
+        self.pool.columns['size'][self.slot] = update_size
+
+    def to_series(self):
+        return pd.Series(
+            data = [self.get_order_id(), self.get_order_type(), self.get_direction(), self.get_size(), self.get_security(), self.get_price_limit(), self.get_status(), self.get_arrival_datetime(), self.get_is_iceberg_peak()],
+            index = PooledOrder.attributes,
+            name = self.get_order_id()
+        )
+
+
 
 if __name__ == '__main__':
     m1 = MarketOrder(direction='Buy', size=100, security='AMZN')
     l1 = LimitOrder(direction='Buy', size=100, price_limit=1000, security='AMZN')
     ib1 = IcebergOrder(direction='Buy', iceberg_order_size=1000, price_limit=1500, security='AMZN', peak_size=100)
+    pool = OrderPool('AMZN')
+    p1 = pool.add(direction='Sell', size=100, price_limit=1010)
+    for o in (m1, l1, ib1, p1):
+        print(o)
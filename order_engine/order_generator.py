@@ -6,13 +6,15 @@
 @Author  :   Clay
 '''
 
+import os
 import time
 import random
+import datetime as dt
 import warnings
 warnings.filterwarnings('ignore')
 import numpy as np
 
-from order import LimitOrder, MarketOrder
+from order import LimitOrder, MarketOrder, OrderPool
 from orderbook import OrderBook
 from price_history import PriceHistoryDB
 from matching_engine import MatchingEngine
@@ -21,53 +23,106 @@ from matching_engine import MatchingEngine
 class PrimaryOrderGenerator:
     indicative_order_count = 1000
     sigma = 0.1
-    k = 1000
 
-    def __init__(self, orderbook:OrderBook, previous_close_price:float):
+    def __init__(self, orderbook:OrderBook, previous_close_price:float, seed:int=None):
         self.orderbook = orderbook
         self.previous_close_price = previous_close_price
-
-    def generate_bid_side(self, order_count:int=indicative_order_count):
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.sequence = 0
+
+    def generate_side_arrays(self, bid_side:bool=True, order_count:int=indicative_order_count):
+        """
+        以数组形式生成一侧的价格、数量和逻辑到达序号。
+        序号在同一个生成器内严格递增，代替原来用 time.sleep 拉开的到达时间。
+        """
         random_prices = np.round(
-            np.random.normal(
+            self.rng.normal(
                 loc=self.previous_close_price,
                 scale=self.sigma * self.previous_close_price,
                 size=order_count
             ), decimals=2
         )
-        random_bid_prices = random_prices[random_prices < self.previous_close_price]
-        random_order_sizes = np.random.randint(low=100, high=1000, size=len(random_bid_prices))
-        time_delay = 10**(-self.k)
-        for i in range(len(random_bid_prices)):
-            self.orderbook.insert_order(
-                LimitOrder(
-                    direction='Buy',
-                    size=random_order_sizes[i],
-                    price_limit=random_bid_prices[i]
-                )
-            )
-            time.sleep(time_delay)
+        if bid_side:
+            prices = random_prices[random_prices < self.previous_close_price]
+        else:
+            prices = random_prices[random_prices > self.previous_close_price]
+        sizes = self.rng.integers(low=100, high=1000, size=len(prices))
+        sequence = np.arange(self.sequence, self.sequence + len(prices), dtype=np.int64)
+        self.sequence += len(prices)
+        return {"Price_limit": prices, "Size": sizes, "Sequence": sequence}
+
+    def generate_book_arrays(self, order_count:int=indicative_order_count):
+        """
+        依次生成卖方和买方的数组，结果只取决于 seed，可以缓存复用。
+        """
+        ask_side = self.generate_side_arrays(bid_side=False, order_count=order_count)
+        bid_side = self.generate_side_arrays(bid_side=True, order_count=order_count)
+        return {
+            **{f"Ask_{name}": values for name, values in ask_side.items()},
+            **{f"Bid_{name}": values for name, values in bid_side.items()},
+        }
+
+    def load_side_arrays(self, arrays:dict, bid_side:bool=True, start_time:int=None, pool:OrderPool=None):
+        """
+        一次性把数组装入订单簿，到达时间为 start_time(纳秒)加上序号。
+        给定 pool 时订单写入订单池，订单簿中保存池视图。
+        """
+        start_time = time.time_ns() if start_time is None else start_time
+        direction = 'Buy' if bid_side else 'Sell'
+        arrival_times = start_time + arrays["Sequence"]
+        if pool is not None:
+            orders = pool.extend(direction, arrays["Size"], arrays["Price_limit"], arrival_times)
+        else:
+            security = self.orderbook.get_security()
+            orders = [
+                LimitOrder(direction=direction, size=size, price_limit=price, security=security, arrival_time=arrival_time)
+                for price, size, arrival_time in zip(arrays["Price_limit"].tolist(), arrays["Size"].tolist(),
+                                                     arrival_times.tolist())
+            ]
+        self.orderbook.insert_orders(orders, bid_side=bid_side)
+
+    def load_book_arrays(self, arrays:dict, start_time:int=None, pool:OrderPool=None):
+        start_time = time.time_ns() if start_time is None else start_time
+        for prefix, bid_side in (("Ask", False), ("Bid", True)):
+            side = {name: arrays[f"{prefix}_{name}"] for name in ("Price_limit", "Size", "Sequence")}
+            self.load_side_arrays(side, bid_side=bid_side, start_time=start_time, pool=pool)
+
+    def seed_book(self, order_count:int=indicative_order_count, cache_path:str=None, pool:OrderPool=None):
+        """
+        生成并装入整本订单簿。给定 cache_path 时，缓存中记录的 seed、order_count、
+        previous_close_price 和 sigma 与当前一致才直接读取，否则重新生成并覆盖缓存。
+        未设 seed 时结果不可复现，总是重新生成。
+        """
+        params = self.cache_params(order_count)
+        arrays = None
+        if cache_path is not None and self.seed is not None and os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                if all(name in cached.files and cached[name] == value for name, value in params.items()):
+                    arrays = {name: cached[name] for name in cached.files if name not in params}
+        if arrays is None:
+            arrays = self.generate_book_arrays(order_count)
+            if cache_path is not None:
+                np.savez(cache_path, **arrays, **params)
+        self.load_book_arrays(arrays, pool=pool)
+        return arrays
+
+    def cache_params(self, order_count:int=indicative_order_count):
+        """
+        决定生成结果的参数，随数组一起存入缓存用于校验。
+        """
+        return {
+            "Param_seed": -1 if self.seed is None else self.seed,
+            "Param_order_count": order_count,
+            "Param_previous_close_price": self.previous_close_price,
+            "Param_sigma": self.sigma,
+        }
+
+    def generate_bid_side(self, order_count:int=indicative_order_count):
+        self.load_side_arrays(self.generate_side_arrays(bid_side=True, order_count=order_count), bid_side=True)
     
     def generate_ask_side(self, order_count:int=indicative_order_count):
-        random_prices = np.round(
-            np.random.normal(
-                loc=self.previous_close_price,
-                scale=self.sigma * self.previous_close_price,
-                size=order_count
-            ), decimals=2
-        )
-        random_ask_prices = random_prices[random_prices > self.previous_close_price]
-        random_order_sizes = np.random.randint(low=100, high=1000, size=len(random_ask_prices))
-        time_delay = 10**(-self.k)
-        for i in range(len(random_ask_prices)):
-            self.orderbook.insert_order(
-                LimitOrder(
-                    direction='Sell',
-                    size=random_order_sizes[i],
-                    price_limit=random_ask_prices[i]
-                )
-            )
-            time.sleep(time_delay)
+        self.load_side_arrays(self.generate_side_arrays(bid_side=False, order_count=order_count), bid_side=False)
 
 
 class OrderGenerator:
@@ -111,11 +166,11 @@ if __name__ == '__main__':
     primary_generator.generate_bid_side()
     book.display()
     db = PriceHistoryDB("AMZN")
-    data = [2229, '12:15:01', [25, 54], 2000]
+    data = [2229, dt.datetime(2023, 6, 13, 12, 15, 1), [25, 54], 2000]
     db.insert_trade(data)
-    data = [2230, '12:17:25', [4, 21], 4000]
+    data = [2230, dt.datetime(2023, 6, 13, 12, 17, 25), [4, 21], 4000]
     db.insert_trade(data)
-    data = [2228, '13:27:00', [11, 10], 5000]
+    data = [2228, dt.datetime(2023, 6, 13, 13, 27, 0), [11, 10], 5000]
     db.insert_trade(data)
     
     me = MatchingEngine(book, db)
@@ -8,90 +8,286 @@
 
 import os
 import time
+import heapq
 import numpy as np
 import pandas as pd
 from tabulate import tabulate
+
+from order import PooledOrder
 pd.options.display.max_columns = None
 
 
+class PriceLevel:
+    """
+    单一价位上的订单队列，按到达顺序(FIFO)排列。
+    dict 保持插入顺序，因此按订单号撤单也是 O(1)。
+    """
+    __slots__ = ('price', 'orders', 'size')
+
+    def __init__(self, price:float):
+        self.price = price
+        self.orders = {}
+        self.size = 0
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __iter__(self):
+        return iter(self.orders.values())
+
+    def append(self, order):
+        self.orders[order.get_order_id()] = order
+        self.size += order.get_size()
+
+    def remove(self, order_id:int):
+        order = self.orders.pop(order_id)
+        self.size -= order.get_size()
+        return order
+
+    def head(self):
+        return next(iter(self.orders.values()))
+
+    def update_order_size(self, order_id:int, updated_size:int):
+        order = self.orders[order_id]
+        self.size += updated_size - order.get_size()
+        order.update_size(updated_size)
+
+
+class BookSide:
+    """
+    订单簿的一侧：价位 -> PriceLevel，以及一个价位堆。
+    堆中的键为买价的负数或卖价本身，因此最优价位总在堆顶。
+    新价位入堆 O(log L)；价位清空时只从 dict 删除(O(1))，
+    堆中残留的键在 best_level 查看堆顶时才被弹出(延迟删除)。
+    """
+
+    def __init__(self, bid_side:bool):
+        self.bid_side = bid_side
+        self.levels = {}
+        self.heap = []
+        # 堆中已有键的价位(含已清空但尚未弹出的价位)，保证每个价位只入堆一次
+        self.in_heap = set()
+
+    def __len__(self):
+        return len(self.levels)
+
+    def _key(self, price:float):
+        return -price if self.bid_side else price
+
+    def best_level(self):
+        heap = self.heap
+        while heap:
+            price = -heap[0] if self.bid_side else heap[0]
+            level = self.levels.get(price)
+            if level is not None:
+                return level
+            heapq.heappop(heap)
+            self.in_heap.discard(price)
+        return None
+
+    def get_level(self, price:float):
+        return self.levels.get(price)
+
+    def add(self, order):
+        price = order.get_price_limit()
+        level = self.levels.get(price)
+        if level is None:
+            level = self.levels[price] = PriceLevel(price)
+            if price not in self.in_heap:
+                self.in_heap.add(price)
+                heapq.heappush(self.heap, self._key(price))
+        level.append(order)
+
+    def extend(self, orders):
+        """
+        批量挂入订单：先按价位分组入队，最后把新价位的键一次性并入堆，
+        避免逐个价位入堆。
+        """
+        new_keys = []
+        for order in orders:
+            price = order.get_price_limit()
+            level = self.levels.get(price)
+            if level is None:
+                level = self.levels[price] = PriceLevel(price)
+                if price not in self.in_heap:
+                    self.in_heap.add(price)
+                    new_keys.append(self._key(price))
+            level.append(order)
+        if new_keys:
+            self.heap.extend(new_keys)
+            heapq.heapify(self.heap)
+
+    def remove(self, order):
+        price = order.get_price_limit()
+        level = self.levels[price]
+        level.remove(order.get_order_id())
+        if not level:
+            self.drop_level(level)
+        return order
+
+    def drop_level(self, level:PriceLevel):
+        """
+        O(1) 删除价位，堆中的键留待延迟删除。
+        残留键过多时按存活价位重建堆，摊还后仍为 O(1)。
+        """
+        del self.levels[level.price]
+        if len(self.heap) > 2 * len(self.levels) + 64:
+            self.heap = [self._key(price) for price in self.levels]
+            heapq.heapify(self.heap)
+            self.in_heap = set(self.levels)
+
+    def iter_levels(self, max_levels:int=None):
+        """
+        按价格优先顺序遍历价位。给定 max_levels 时只部分选出最优的几个价位，
+        O(L log max_levels)，不对整侧排序。
+        """
+        if max_levels is None:
+            prices = sorted(self.levels, reverse=self.bid_side)
+        else:
+            prices = (heapq.nlargest if self.bid_side else heapq.nsmallest)(max_levels, self.levels)
+        for price in prices:
+            yield self.levels[price]
+
+    def iter_orders(self, max_levels:int=None):
+        """按价格-时间优先顺序遍历订单，可只取最优的 max_levels 个价位。"""
+        for level in self.iter_levels(max_levels):
+            yield from level
+
+    def aggregate_size(self):
+        """整侧挂单总量，直接累加各价位数量，无需排序。"""
+        return sum(level.size for level in self.levels.values())
+
+
 class OrderBook:
     columns = ['Order ID', 'Order_type', 'Direction', 'Size', 'Price_limit', 'Security', 'Status', 'Arrival_time']
 
     def __init__(self, security:str="AMZN"):
         self.security = security
+        # 订单号索引
         self.bid_side = {}
         self.ask_side = {}
+        # 价位索引
+        self.bid_levels = BookSide(bid_side=True)
+        self.ask_levels = BookSide(bid_side=False)
 
     def get_security(self):
         return self.security
+
+    def _side(self, bid_side:bool):
+        if bid_side:
+            return self.bid_side, self.bid_levels
+        return self.ask_side, self.ask_levels
     
     def insert_order(self, order):
         order_id = order.get_order_id()
-        order_direction = order.get_direction()
-        if order_direction == 'Sell':
-            if order_id not in self.ask_side.keys():
-                self.ask_side[order_id] = order
-            else:
-                raise Exception("Order already in the order book.")
-        else:
-            if order_id not in self.bid_side.keys():
-                self.bid_side[order_id] = order
-            else:
+        index, levels = self._side(order.is_buy())
+        if order_id in self.bid_side or order_id in self.ask_side:
+            raise Exception("Order already in the order book.")
+        index[order_id] = order
+        levels.add(order)
+
+    def insert_orders(self, orders, bid_side:bool=True):
+        """
+        批量挂入同一方向的订单，订单按给定顺序排队。
+        """
+        index, levels = self._side(bid_side)
+        for order in orders:
+            order_id = order.get_order_id()
+            if order_id in self.bid_side or order_id in self.ask_side:
                 raise Exception("Order already in the order book.")
+            index[order_id] = order
+        levels.extend(orders)
 
     def pop_order(self, order_id:int=None):
-        if order_id in self.bid_side.keys():
-            return self.bid_side.pop(order_id)
+        if order_id in self.bid_side:
+            order = self.bid_levels.remove(self.bid_side.pop(order_id))
         else:
-            return self.ask_side.pop(order_id)
-        
+            order = self.ask_levels.remove(self.ask_side.pop(order_id))
+        if isinstance(order, PooledOrder):
+            order.pool.release(order.slot)
+        return order
+
+    def get_order(self, order_id:int):
+        order = self.bid_side.get(order_id)
+        return order if order is not None else self.ask_side[order_id]
+
+    def update_order_size(self, order_id:int, updated_size:int):
+        """
+        修改挂单数量，保持所在价位的聚合数量一致。
+        """
+        order = self.get_order(order_id)
+        levels = self.bid_levels if order_id in self.bid_side else self.ask_levels
+        levels.get_level(order.get_price_limit()).update_order_size(order_id, updated_size)
+
+    def requeue_order(self, order_id:int, updated_size:int):
+        """
+        修改挂单数量并把它移到所在价位的队尾(失去时间优先)，价位保持不变。
+        """
+        order = self.get_order(order_id)
+        levels = self.bid_levels if order_id in self.bid_side else self.ask_levels
+        level = levels.get_level(order.get_price_limit())
+        level.remove(order_id)
+        order.update_size(updated_size)
+        level.append(order)
+
+    def get_best_level(self, bid_side:bool=True):
+        return self._side(bid_side)[1].best_level()
+
+    def get_best_order(self, bid_side:bool=True):
+        level = self.get_best_level(bid_side)
+        return None if level is None else level.head()
+
+    def get_best_price(self, bid_side:bool=True):
+        level = self.get_best_level(bid_side)
+        return None if level is None else level.price
+
+    def get_depth(self, bid_side:bool=True):
+        return len(self._side(bid_side)[1])
+
+    def iter_levels(self, bid_side:bool=True, max_levels:int=None):
+        return self._side(bid_side)[1].iter_levels(max_levels)
+
+    def iter_orders(self, bid_side:bool=True, max_levels:int=None):
+        return self._side(bid_side)[1].iter_orders(max_levels)
+
+    def get_level_arrays(self, bid_side:bool=True):
+        """
+        按价格优先顺序返回各价位的价格和聚合数量数组。
+        """
+        levels = list(self.iter_levels(bid_side))
+        prices = np.fromiter((level.price for level in levels), dtype=np.float64, count=len(levels))
+        sizes = np.fromiter((level.size for level in levels), dtype=np.int64, count=len(levels))
+        return prices, sizes
+
     def to_dataframe(self, bid_side:bool=True):
-        book_size = self.bid_side if bid_side else self.ask_side
-        order_series = [order.to_series() for order in book_size.values()]
+        order_series = [order.to_series() for order in self.iter_orders(bid_side)]
+        if not order_series:
+            return pd.DataFrame(columns=self.columns).set_index(keys='Order ID')
         return pd.concat(objs=order_series, axis=1).T.set_index(keys='Order ID')
     
     def sort_price_time(self, bid_side:bool=True):
         """
         价格-时间优先排序的订单簿，没有订单聚合。
         返回一个数据表格，其中最好的出价或报价在数据框架的顶部。
+        价位本身已经有序，这里只是按优先顺序生成视图，不再排序。
         """
-        if bid_side:
-            return self.to_dataframe(bid_side).sort_values(
-                axis=0,
-                by=['Price_limit', 'Arrival_time'],
-                ascending=[False, True]
-            )
-        else:
-            return self.to_dataframe(bid_side).sort_values(
-                axis=0,
-                by=['Price_limit', 'Arrival_time'],
-                ascending=[True, True]
-            )
+        return self.to_dataframe(bid_side)
         
     def get_aggregate_size(self, bid_side:bool=True):
-        return self.to_dataframe(bid_side)['Size'].sum(axis=0)
+        return self._side(bid_side)[1].aggregate_size()
 
     def display(self, display_size:int=5):
         display_columns = ['Security', 'Direction', 'Price_limit', 'Size',
                            'Aggregate_size', 'Arrival_time']
-        # 订单簿
-        book_ask_side = self.to_dataframe(bid_side=False)
-        book_bid_side = self.to_dataframe(bid_side=True)
-        # 排队
-        book_ask_side.sort_values(
-            axis=0,
-            by=['Price_limit', 'Arrival_time'],
-            ascending=[True, True],
-            inplace=True
-        )
-        book_bid_side.sort_values(
-            axis=0,
-            by=['Price_limit', 'Arrival_time'],
-            ascending=[False, True],
-            inplace=True
-        )
+        # 订单簿(已按价格-时间优先排队)，只取展示所需的订单；每个价位至少一笔订单，最优 display_size 个价位足够
+        ask_orders = [order.to_series() for _, order in
+                      zip(range(display_size), self.iter_orders(bid_side=False, max_levels=display_size))]
+        bid_orders = [order.to_series() for _, order in
+                      zip(range(display_size), self.iter_orders(bid_side=True, max_levels=display_size))]
+        book_ask_side = pd.DataFrame(ask_orders, columns=self.columns).set_index(keys='Order ID')
+        book_bid_side = pd.DataFrame(bid_orders, columns=self.columns).set_index(keys='Order ID')
         # 聚合
-        book_ask_side['Aggregate_size'] = book_ask_side['Size'][::-1].cumsum(axis=0)[::-1]
+        book_ask_side['Aggregate_size'] = book_ask_side['Size'].cumsum(axis=0)
         book_bid_side['Aggregate_size'] = book_bid_side['Size'].cumsum(axis=0)
 
         sep_series = pd.Series(data = [' ' for _ in range(len(book_ask_side.columns))], 
@@ -99,7 +295,7 @@ class OrderBook:
         
         sep_frame = sep_series.to_frame().transpose()
         
-        entire_book = pd.concat([book_ask_side.iloc[-display_size:][::-1], sep_frame, book_bid_side.iloc[:display_size]]).rename_axis(index = 'Order ID')
+        entire_book = pd.concat([book_ask_side[::-1], sep_frame, book_bid_side]).rename_axis(index = 'Order ID')
         print('\n')
         # print(entire_book)
         print(tabulate(entire_book[display_columns], headers = display_columns,
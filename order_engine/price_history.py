@@ -7,48 +7,331 @@
 '''
 
 # 
-# Place on MongoDB
+# 内存中的 TradeStore，或本地分段文件上的 TradeLog(持久化模式)
 # 
+import os
+import datetime as dt
 import numpy as np
 import pandas as pd
 
 
+TRADE_DTYPE = np.dtype([
+    ("Trade_price", np.float64),
+    ("Execution_time", "datetime64[ns]"),
+    ("Resting_order_id", np.int64),
+    ("Aggressive_order_id", np.int64),
+    ("Size", np.int64),
+])
+
+
+class TradeStore:
+    """
+    只追加的列式成交存储。每一列是一个预分配的 NumPy 数组，容量不足时翻倍。
+    成交时间以 datetime64[ns] 保存，两个订单号分别保存为 int64 列。
+    """
+    dtype = TRADE_DTYPE
+
+    def __init__(self, capacity:int=1024):
+        self.columns = {name: np.empty(capacity, dtype=self.dtype[name]) for name in self.dtype.names}
+        self.capacity = capacity
+        self.count = 0
+        self.total_volume = 0
+        self.total_notional = 0.0
+
+    def __len__(self):
+        return self.count
+
+    def _reserve(self, extra:int):
+        required = self.count + extra
+        if required <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < required:
+            capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            self.columns[name] = grown
+        self.capacity = capacity
+
+    def append(self, prices, execution_times, resting_order_ids, aggressive_order_ids, sizes):
+        """
+        追加一批成交，各参数为等长的数组。
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        sizes = np.asarray(sizes, dtype=np.int64)
+        n = len(prices)
+        self._reserve(n)
+        start, end = self.count, self.count + n
+        self.columns["Trade_price"][start:end] = prices
+        self.columns["Execution_time"][start:end] = np.asarray(execution_times, dtype="datetime64[ns]")
+        self.columns["Resting_order_id"][start:end] = resting_order_ids
+        self.columns["Aggressive_order_id"][start:end] = aggressive_order_ids
+        self.columns["Size"][start:end] = sizes
+        self.count = end
+        self.total_volume += int(sizes.sum())
+        self.total_notional += float(prices @ sizes)
+
+    def column(self, name:str):
+        """
+        返回某列已写入部分的视图(不拷贝)。
+        """
+        return self.columns[name][:self.count]
+
+    def last(self, name:str):
+        if self.count == 0:
+            raise IndexError("No trades recorded.")
+        return self.columns[name][self.count - 1]
+
+    def between(self, t0, t1):
+        """
+        成交时间在 [t0, t1] 之间的成交，按列返回视图。
+        """
+        times = self.column("Execution_time")
+        start = np.searchsorted(times, np.datetime64(t0, "ns"), side="left")
+        end = np.searchsorted(times, np.datetime64(t1, "ns"), side="right")
+        return {name: self.columns[name][start:end] for name in self.dtype.names}
+
+    def tail(self, n:int):
+        start = max(self.count - n, 0)
+        return {name: self.columns[name][start:self.count] for name in self.dtype.names}
+
+    def get_vwap(self):
+        return self.total_notional / self.total_volume if self.total_volume else np.nan
+
+
+class TradeLog:
+    """
+    分段的二进制成交日志。每个段文件是 TRADE_DTYPE 记录的原始数组，
+    写满 segment_size 条后封段并开新段；读取时按段做内存映射，
+    并用段索引(条数、首末成交时间、成交量、成交额)定位时间区间，不必整体载入。
+    重启时只读取段索引和当前活动段即可恢复统计量。
+    """
+    dtype = TRADE_DTYPE
+    index_dtype = np.dtype([
+        ("Count", np.int64),
+        ("First_time", "datetime64[ns]"),
+        ("Last_time", "datetime64[ns]"),
+        ("Volume", np.int64),
+        ("Notional", np.float64),
+    ])
+
+    def __init__(self, directory:str, segment_size:int=1 << 20):
+        self.directory = directory
+        self.segment_size = segment_size
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, "index.npy")
+        self.index = np.load(self.index_path) if os.path.exists(self.index_path) else np.empty(0, dtype=self.index_dtype)
+        self.mmaps = {}
+        self._open_active_segment()
+        sealed = self.index[:-1]
+        self.count = int(sealed["Count"].sum())
+        self.total_volume = int(sealed["Volume"].sum())
+        self.total_notional = float(sealed["Notional"].sum())
+        active = self.index[-1]
+        self.count += int(active["Count"])
+        self.total_volume += int(active["Volume"])
+        self.total_notional += float(active["Notional"])
+
+    def __len__(self):
+        return self.count
+
+    def segment_path(self, segment:int):
+        return os.path.join(self.directory, f"segment_{segment:06d}.bin")
+
+    def _open_active_segment(self):
+        """
+        打开(或新建)最后一个段，按文件实际大小重建它的索引项，
+        并截掉中断写入留下的半条记录。
+        """
+        if len(self.index) == 0:
+            self.index = np.zeros(1, dtype=self.index_dtype)
+        segment = len(self.index) - 1
+        path = self.segment_path(segment)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        count = size // self.dtype.itemsize
+        if size != count * self.dtype.itemsize:
+            os.truncate(path, count * self.dtype.itemsize)
+        entry = np.zeros(1, dtype=self.index_dtype)[0]
+        if count:
+            records = np.memmap(path, dtype=self.dtype, mode="r", shape=(count,))
+            entry["Count"] = count
+            entry["First_time"] = records["Execution_time"][0]
+            entry["Last_time"] = records["Execution_time"][-1]
+            entry["Volume"] = records["Size"].sum()
+            entry["Notional"] = records["Trade_price"] @ records["Size"]
+            del records
+        self.index[segment] = entry
+        self.active = open(path, "ab")
+
+    def _seal_active_segment(self):
+        self.active.close()
+        self.index = np.concatenate([self.index, np.zeros(1, dtype=self.index_dtype)])
+        np.save(self.index_path, self.index)
+        self.active = open(self.segment_path(len(self.index) - 1), "ab")
+
+    def append(self, prices, execution_times, resting_order_ids, aggressive_order_ids, sizes):
+        records = np.empty(len(prices), dtype=self.dtype)
+        records["Trade_price"] = prices
+        records["Execution_time"] = np.asarray(execution_times, dtype="datetime64[ns]")
+        records["Resting_order_id"] = resting_order_ids
+        records["Aggressive_order_id"] = aggressive_order_ids
+        records["Size"] = sizes
+
+        while len(records):
+            entry = self.index[-1]
+            room = self.segment_size - int(entry["Count"])
+            if room == 0:
+                self._seal_active_segment()
+                continue
+            chunk, records = records[:room], records[room:]
+            self.active.write(chunk.tobytes())
+            volume = int(chunk["Size"].sum())
+            notional = float(chunk["Trade_price"] @ chunk["Size"])
+            if entry["Count"] == 0:
+                entry["First_time"] = chunk["Execution_time"][0]
+            entry["Last_time"] = chunk["Execution_time"][-1]
+            entry["Count"] += len(chunk)
+            entry["Volume"] += volume
+            entry["Notional"] += notional
+            self.index[-1] = entry
+            self.count += len(chunk)
+            self.total_volume += volume
+            self.total_notional += notional
+        self.active.flush()
+
+    def segment(self, segment:int):
+        """
+        以内存映射方式读取某个段。已封段的映射会被缓存。
+        """
+        count = int(self.index[segment]["Count"])
+        if count == 0:
+            return np.empty(0, dtype=self.dtype)
+        if segment < len(self.index) - 1:
+            if segment not in self.mmaps:
+                self.mmaps[segment] = np.memmap(self.segment_path(segment), dtype=self.dtype, mode="r", shape=(count,))
+            return self.mmaps[segment]
+        return np.memmap(self.segment_path(segment), dtype=self.dtype, mode="r", shape=(count,))
+
+    def _to_columns(self, parts):
+        records = np.concatenate(parts) if parts else np.empty(0, dtype=self.dtype)
+        return {name: records[name] for name in self.dtype.names}
+
+    def column(self, name:str):
+        """
+        整列读取，会把所有段载入内存；大数据量请用 between 或 tail。
+        """
+        return np.concatenate([self.segment(i)[name] for i in range(len(self.index))])
+
+    def last(self, name:str):
+        for segment in range(len(self.index) - 1, -1, -1):
+            if self.index[segment]["Count"]:
+                return self.segment(segment)[name][-1]
+        raise IndexError("No trades recorded.")
+
+    def between(self, t0, t1):
+        t0, t1 = np.datetime64(t0, "ns"), np.datetime64(t1, "ns")
+        overlap = (self.index["Count"] > 0) & (self.index["First_time"] <= t1) & (self.index["Last_time"] >= t0)
+        parts = []
+        for segment in np.flatnonzero(overlap):
+            records = self.segment(segment)
+            times = records["Execution_time"]
+            start = np.searchsorted(times, t0, side="left")
+            end = np.searchsorted(times, t1, side="right")
+            parts.append(np.array(records[start:end]))
+        return self._to_columns(parts)
+
+    def tail(self, n:int):
+        parts = []
+        for segment in range(len(self.index) - 1, -1, -1):
+            if n <= 0:
+                break
+            records = self.segment(segment)
+            parts.append(np.array(records[max(len(records) - n, 0):]))
+            n -= len(records)
+        return self._to_columns(parts[::-1])
+
+    def get_vwap(self):
+        return self.total_notional / self.total_volume if self.total_volume else np.nan
+
+    def close(self):
+        self.active.close()
+        np.save(self.index_path, self.index)
+        self.mmaps.clear()
+
+
 class PriceHistoryDB:
-    columns = ["Trade_price", "Execution_time", "Matched_orders", "Size"]
+    columns = ["Trade_price", "Execution_time", "Resting_order_id", "Aggressive_order_id", "Size"]
 
-    def __init__(self, security:str="AMZN"):
+    def __init__(self, security:str="AMZN", path:str=None, segment_size:int=1 << 20):
+        """
+        给定 path 时成交写入本地分段日志(持久化模式)，否则只保存在内存中。
+        """
         self.security = security
-        self.price_history = pd.DataFrame(columns=self.columns)
+        if path is None:
+            self.trades = TradeStore()
+        else:
+            self.trades = TradeLog(path, segment_size=segment_size)
+
+    @property
+    def price_history(self):
+        return pd.DataFrame({name: self.trades.column(name) for name in self.columns}, copy=False)
 
     def insert_trade(self, trade_data):
-        trade_details = pd.DataFrame(
-            data=np.array(trade_data).reshape((1,4)),
-            columns=self.columns
-        )
-        self.price_history = pd.concat([self.price_history, trade_details], ignore_index=True)
+        self.insert_trades([trade_data])
+
+    def insert_trades(self, trades):
+        """
+        一次追加多笔成交，撮合引擎对每笔主动订单只调用一次。
+        每笔成交为 [成交价, 成交时间, [被动方订单号, 主动方订单号], 数量]，没有成交时直接返回。
+        """
+        if len(trades) == 0:
+            return
+        prices, execution_times, matched_orders, sizes = zip(*trades)
+        resting_order_ids, aggressive_order_ids = zip(*matched_orders)
+        self.trades.append(prices, execution_times, resting_order_ids, aggressive_order_ids, sizes)
     
     def get_last_traded_price(self):
-        return self.price_history.iloc[-1]['Trade_price']
+        return self.trades.last("Trade_price")
     
     def get_trade_count(self):
-        return self.price_history.shape[0]
+        return len(self.trades)
     
     def get_price_history(self, execution_time_index:bool=True):
+        prices = self.trades.column("Trade_price")
         if execution_time_index:
-            return self.price_history.set_index(keys=['Execution_time'])['Trade_price']
+            index = pd.DatetimeIndex(self.trades.column("Execution_time"), name="Execution_time")
+            return pd.Series(prices, index=index, name="Trade_price", copy=False)
         else:
-            return self.price_history['Trade_price']
+            return pd.Series(prices, name="Trade_price", copy=False)
+
+    def get_trades_between(self, t0, t1):
+        """
+        成交时间在 [t0, t1] 之间的成交。
+        """
+        return pd.DataFrame(self.trades.between(t0, t1), columns=self.columns)
+
+    def get_last_trades(self, n:int):
+        return pd.DataFrame(self.trades.tail(n), columns=self.columns)
     
     def get_total_volume(self):
-        return self.price_history['Size'].sum()
+        return self.trades.total_volume
+
+    def get_vwap(self):
+        return self.trades.get_vwap()
+
+    def close(self):
+        if isinstance(self.trades, TradeLog):
+            self.trades.close()
     
 
 if __name__ == '__main__':
     db = PriceHistoryDB()
-    data = [100, '12:15:01', [25, 54], 2000]
+    data = [100, dt.datetime(2023, 6, 13, 12, 15, 1), [25, 54], 2000]
     db.insert_trade(data)
-    data = [125, '12:17:25', [4, 21], 4000]
+    data = [125, dt.datetime(2023, 6, 13, 12, 17, 25), [4, 21], 4000]
     db.insert_trade(data)
-    data = [110, '13:27:00', [11, 10], 5000]
+    data = [110, dt.datetime(2023, 6, 13, 13, 27, 0), [11, 10], 5000]
     db.insert_trade(data)
-    print(db.price_history)   
\ No newline at end of file
+    print(db.price_history)
+    print(db.get_vwap())
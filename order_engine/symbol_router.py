@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   symbol_router.py
+@Time    :   2023/06/24 16:05:12
+@Author  :   Clay
+'''
+
+import multiprocessing as mp
+from collections import deque
+import numpy as np
+import pandas as pd
+
+from orderbook import OrderBook
+from price_history import PriceHistoryDB, TRADE_DTYPE
+from matching_engine import MatchingEngine
+
+
+class SymbolShard:
+    """
+    一个进程内的若干品种，每个品种各有一本订单簿和一个撮合引擎。
+    """
+
+    def __init__(self, securities):
+        self.engines = {}
+        self.published = {}
+        for security in securities:
+            self.engines[security] = MatchingEngine(OrderBook(security), PriceHistoryDB(security))
+            self.published[security] = 0
+
+    def process(self, orders):
+        """
+        按品种把订单放入各自引擎的队列并全部撮合，返回本批新产生的成交。
+        """
+        for order in orders:
+            self.engines[order.get_security()].add_to_buffer(order)
+        for engine in self.engines.values():
+            engine.dispatch()
+        return self.collect_trades()
+
+    def set_auction_mode(self, auction_mode:bool):
+        for engine in self.engines.values():
+            engine.set_auction_mode(auction_mode)
+
+    def collect_trades(self):
+        """
+        各品种自上次发布以来的新成交，形式为 [(品种, TRADE_DTYPE 记录数组)]。
+        """
+        trades = []
+        for security, engine in self.engines.items():
+            store = engine.price_history.trades
+            start, end = self.published[security], len(store)
+            if end > start:
+                records = np.empty(end - start, dtype=TRADE_DTYPE)
+                for name in TRADE_DTYPE.names:
+                    records[name] = store.column(name)[start:end]
+                trades.append((security, records))
+                self.published[security] = end
+        return trades
+
+
+def run_shard(securities, requests:mp.Queue, results:mp.Queue):
+    """
+    工作进程主循环。请求为 ("orders", 订单列表)、("auction", bool) 或 ("stop", None)。
+    """
+    shard = SymbolShard(securities)
+    while True:
+        command, payload = requests.get()
+        if command == "orders":
+            results.put(shard.process(payload))
+        elif command == "auction":
+            shard.set_auction_mode(payload)
+        elif command == "stop":
+            break
+
+
+class SymbolRouter:
+    """
+    多品种撮合：品种按顺序轮流分配到工作进程，订单按品种路由到对应进程，
+    各进程返回的成交合并成一条按成交时间排序的成交流。
+    workers=0 时所有品种在当前进程内撮合。
+    """
+
+    def __init__(self, securities, workers:int=None):
+        securities = sorted(set(securities))
+        workers = min(mp.cpu_count(), len(securities)) if workers is None else min(workers, len(securities))
+        self.workers = workers
+        self.assignment = {security: i % max(workers, 1) for i, security in enumerate(securities)}
+        self.pending = [[] for _ in range(max(workers, 1))]
+        self.in_flight = 0
+        self.trades = deque()
+
+        if workers == 0:
+            self.local_shard = SymbolShard(securities)
+            return
+        self.results = mp.Queue()
+        self.requests = [mp.Queue() for _ in range(workers)]
+        self.processes = []
+        for i in range(workers):
+            shard_securities = [security for security, worker in self.assignment.items() if worker == i]
+            process = mp.Process(target=run_shard, args=(shard_securities, self.requests[i], self.results), daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def submit_order(self, order):
+        self.pending[self.assignment[order.get_security()]].append(order)
+
+    def submit_orders(self, orders):
+        for order in orders:
+            self.submit_order(order)
+
+    def set_auction_mode(self, auction_mode:bool):
+        self.flush()
+        if self.workers == 0:
+            self.local_shard.set_auction_mode(auction_mode)
+        else:
+            for requests in self.requests:
+                requests.put(("auction", auction_mode))
+
+    def flush(self):
+        """
+        把缓存的订单按批发送到各工作进程，不等待结果。
+        """
+        for i, orders in enumerate(self.pending):
+            if not orders:
+                continue
+            if self.workers == 0:
+                self.trades.extend(self.local_shard.process(orders))
+            else:
+                self.requests[i].put(("orders", orders))
+                self.in_flight += 1
+            self.pending[i] = []
+
+    def drain(self):
+        """
+        等待所有已发送批次的结果。
+        """
+        self.flush()
+        while self.in_flight:
+            self.trades.extend(self.results.get())
+            self.in_flight -= 1
+
+    def trade_stream(self):
+        """
+        按到达顺序逐批产出 (品种, 成交记录数组)。
+        """
+        self.flush()
+        while self.trades or self.in_flight:
+            if not self.trades:
+                self.trades.extend(self.results.get())
+                self.in_flight -= 1
+            yield self.trades.popleft()
+
+    def get_trades(self):
+        """
+        合并所有品种的成交，按成交时间排序，返回 DataFrame。
+        """
+        self.drain()
+        trades, self.trades = list(self.trades), deque()
+        if not trades:
+            return pd.DataFrame(columns=["Security", *TRADE_DTYPE.names])
+        records = np.concatenate([records for _, records in trades])
+        securities = np.concatenate([np.full(len(records), security, dtype=object) for security, records in trades])
+        order = np.argsort(records["Execution_time"], kind="stable")
+        frame = pd.DataFrame(records[order])
+        frame.insert(0, "Security", securities[order])
+        return frame
+
+    def close(self):
+        if self.workers == 0:
+            return
+        self.drain()
+        for requests in self.requests:
+            requests.put(("stop", None))
+        for process in self.processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    from order import LimitOrder, MarketOrder
+
+    securities = ["AMZN", "AAPL", "MSFT", "GOOG"]
+    rng = np.random.default_rng(0)
+    router = SymbolRouter(securities, workers=2)
+    for security in securities:
+        for price, size in zip(np.round(rng.normal(100, 1, 200), 2).tolist(), rng.integers(100, 1000, 200).tolist()):
+            router.submit_order(LimitOrder('Buy' if price < 100 else 'Sell', size, price, security))
+        router.submit_order(MarketOrder('Buy', 2000, security))
+    print(router.get_trades())
+    router.close()
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# trader.py imports traders from the repository root; the option models and
+# the order engine import their siblings by module name
+for path in (ROOT, os.path.join(ROOT, "models", "Option"), os.path.join(ROOT, "order_engine")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,25 @@
+import tracemalloc
+
+import pytest
+
+from AmericanStrats import BinomialPricing, MonteCarloPricing
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"antithetic": True}, {"exercise_dates": 10}])
+def test_longstaff_schwartz_stays_within_max_memory(kwargs):
+    max_memory = 2 ** 20
+    tracemalloc.start()
+    try:
+        result = MonteCarloPricing().calculate(36, 40, 1, 0.06, 0.2, m=50, n=20000, otype="put",
+                                               max_memory=max_memory, seed=0, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak <= max_memory
+    tree = BinomialPricing().calculate_price(36, 40, 1, 0.06, 0.2, 2000, "put")
+    assert abs(result["price"] - tree) < 5 * result["std_error"] + 0.1
+
+
+def test_longstaff_schwartz_rejects_budget_without_training_set():
+    with pytest.raises(ValueError):
+        MonteCarloPricing().calculate(36, 40, 1, 0.06, 0.2, m=50, n=1000, otype="put", max_memory=2 ** 10, seed=0)
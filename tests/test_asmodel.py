@@ -0,0 +1,7 @@
+import importlib
+
+
+def test_asmodel_imports_like_trader():
+    # ready_trader_go/trader.py loads traders with importlib.import_module("models.MM." + name)
+    module = importlib.import_module("models.MM.ASModel")
+    assert hasattr(module, "AutoTrader")
@@ -0,0 +1,14 @@
+import pytest
+
+from price_history import PriceHistoryDB
+
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_insert_trades_accepts_no_fills(tmp_path, persistent):
+    db = PriceHistoryDB("AMZN", path=str(tmp_path / "trades") if persistent else None)
+    db.insert_trades([])
+    assert db.get_trade_count() == 0
+    db.insert_trades([[101.5, 1, [10, 11], 100]])
+    db.insert_trades([])
+    assert db.get_trade_count() == 1
+    assert db.get_last_traded_price() == 101.5
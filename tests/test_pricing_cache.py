@@ -0,0 +1,14 @@
+import copy
+import pickle
+
+from EuroStrats import BlackScholesPricing
+from PricingCache import CachedPricing
+
+
+def test_cached_pricing_pickle_round_trip():
+    cached = CachedPricing(BlackScholesPricing())
+    price = cached.calculate_price(100, 100, 1, 0.05, 0.3, "call")
+    restored = pickle.loads(pickle.dumps(cached))
+    assert restored.calculate_price(100, 100, 1, 0.05, 0.3, "call") == price
+    assert restored.stats()["hits"] == 1
+    assert copy.copy(cached).strategy is cached.strategy